@@ -1,6 +1,5 @@
 import streamlit as st
-import pandas as pd
-from src.streamlit_utils import get_all_papers, safe_json_loads
+from src.streamlit_utils import get_paper_list, get_paper, data_version
 import sys
 
 
@@ -28,19 +27,14 @@ st.sidebar.info(f"Connected to: `{st.session_state.db_path}`")
 
 
 # --- Main Display Area ---
-df = get_all_papers(st.session_state.db_path)
+# Only IDs and titles are loaded for the list; the selected paper's row is fetched on its own.
+# The version makes the cached results refresh whenever the pipeline writes to the database.
+version = data_version(st.session_state.db_path)
+df = get_paper_list(st.session_state.db_path, version)
 
 if df.empty:
     st.warning("The database is empty. Please process papers using `main.py` first.")
 else:
-    # Sidebar for paper selection
-    df['id_str'] = df['path'].str.split(r'[\\/]').str[-1].str.replace('.pdf', '', regex=False)
-    df['ID'] = pd.to_numeric(df['id_str'], errors='coerce')
-    df.dropna(subset=['ID'], inplace=True)
-    df['ID'] = df['ID'].astype(int)
-    df.sort_values(by='ID', inplace=True)
-    df['display_title'] = df['ID'].astype(str) + " : " + df['title'].fillna('Untitled')
-
     # --- Sidebar for paper selection ---
     st.sidebar.title("📄 Select Paper")
 
@@ -51,13 +45,17 @@ else:
         label_visibility="collapsed"
     )
 
-    paper_data = df[df['display_title'] == selected_title].iloc[0]
+    selected_path = df.loc[df['display_title'] == selected_title, 'path'].iloc[0]
+    paper_data = get_paper(st.session_state.db_path, selected_path, version)
+    if not paper_data:
+        # Deleted (or re-saved under another path) since the list was loaded.
+        st.warning("This paper is no longer in the database. Refresh the page to update the list.")
+        st.stop()
 
     # --- Display Paper Details (This part is unchanged) ---
     st.header(paper_data['title'])
 
-    authors_list = safe_json_loads(paper_data['authors'])
-    st.subheader(f"By *{', '.join(authors_list)}*")
+    st.subheader(f"By *{paper_data['authors_display']}*")
 
     doi_value = paper_data.get('doi', '')
 
@@ -111,5 +109,4 @@ else:
     st.subheader("Data Description")
     st.write(paper_data['data_description'])
     st.subheader("Metrics & Performance")
-    metrics_list = safe_json_loads(paper_data['metrics'])
-    st.write(', '.join(metrics_list))
\ No newline at end of file
+    st.write(paper_data['metrics_display'])
\ No newline at end of file
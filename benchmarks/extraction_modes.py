@@ -0,0 +1,138 @@
+"""
+Compares the two extraction modes of `create_graph()` on real papers:
+
+    fanout   - four parallel extraction calls, each with its own context
+    combined - one call for all four field groups over a single shared context
+
+For every paper both modes are run on the same ingested text and we report wall time,
+input/output tokens and the fraction of analysis fields that came back filled.
+The LLM response cache is bypassed so every call reaches the model.
+
+Run from the repository root:
+    python -m benchmarks.extraction_modes [max_papers]
+"""
+import asyncio
+import glob
+import statistics
+import sys
+import time
+import definitions
+from src import nodes, ingestion, initialise_state, llm_cache, document, utils
+
+FIELD_GROUPS = {
+    "methodology": ["proposed_model_name", "methodology", "usp", "experimental_methods"],
+    "analysis": ["problem_statement", "main_findings", "limitations", "future_work"],
+    "dataset": ["dataset_name", "source_type", "granularity_scale", "dataset_duration",
+                "num_data_points", "data_description"],
+    "experiments": ["train_test_split", "horizon", "resolution", "features_used", "data_preprocessing",
+                    "metrics", "data_availability", "code_availability"],
+}
+ALL_FIELDS = [field for fields in FIELD_GROUPS.values() for field in fields]
+
+FANOUT_NODES = [nodes.aextract_methodology_and_models, nodes.aextract_analysis_and_findings,
+                nodes.aextract_dataset_properties, nodes.aextract_experimental_setup]
+
+
+class UsageRecorder:
+    """Wraps the LLM client and adds up the tokens of every call that goes through it."""
+
+    def __init__(self, client):
+        self.client = client
+        self.reset()
+
+    def __getattr__(self, name):
+        # model, temperature, ... are read from the wrapped client (used for cache keys)
+        return getattr(self.client, name)
+
+    def reset(self):
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.calls = 0
+
+    def _record(self, prompt, response):
+        usage = getattr(response, 'usage_metadata', None) or {}
+        self.input_tokens += usage.get('input_tokens') or utils.count_tokens(prompt)
+        self.output_tokens += usage.get('output_tokens') or utils.count_tokens(response.content)
+        self.calls += 1
+
+    def invoke(self, prompt):
+        response = self.client.invoke(prompt)
+        self._record(prompt, response)
+        return response
+
+    async def ainvoke(self, prompt):
+        response = await self.client.ainvoke(prompt)
+        self._record(prompt, response)
+        return response
+
+
+def _prepare(paper_path: str) -> dict:
+    """Ingests one paper (text, sections, landmarks) exactly as the graph would before extraction."""
+    state = initialise_state.initialise_state()
+    state['path'] = paper_path
+    state['fingerprint'] = utils.file_fingerprint(paper_path)
+    with document.paper_session(paper_path):
+        state['raw_text'], _ = ingestion.read_text(paper_path, state['fingerprint'])
+    state['landmarks'], state['sections'] = ingestion.index_text(state['fingerprint'], state['raw_text'])
+    return state
+
+
+async def _run_fanout(state: dict) -> dict:
+    results = await asyncio.gather(*(node(dict(state)) for node in FANOUT_NODES))
+    merged = dict(state)
+    for result in results:
+        for field in ALL_FIELDS:
+            if result.get(field) is not None:
+                merged[field] = result[field]
+    return merged
+
+
+async def _run_combined(state: dict) -> dict:
+    return await nodes.aextract_all_fields(dict(state))
+
+
+def _fill_rate(state: dict) -> float:
+    return sum(1 for field in ALL_FIELDS if state.get(field) not in (None, "", [])) / len(ALL_FIELDS)
+
+
+async def benchmark(paper_paths: list) -> dict:
+    recorder = UsageRecorder(nodes.gemini)
+    nodes.gemini = recorder
+    llm_cache.response_cache.bypass = True
+
+    results = {"fanout": [], "combined": []}
+    for paper_path in paper_paths:
+        state = _prepare(paper_path)
+        for mode, run in (("fanout", _run_fanout), ("combined", _run_combined)):
+            recorder.reset()
+            start = time.perf_counter()
+            final_state = await run(state)
+            results[mode].append({"wall": time.perf_counter() - start,
+                                  "input_tokens": recorder.input_tokens,
+                                  "output_tokens": recorder.output_tokens,
+                                  "calls": recorder.calls,
+                                  "fill_rate": _fill_rate(final_state)})
+    return results
+
+
+def report(results: dict):
+    print(f"{'mode':<10} {'papers':>6} {'wall s/paper':>13} {'input tok':>10} {'output tok':>11} "
+          f"{'calls':>6} {'fill rate':>10}")
+    for mode, rows in results.items():
+        if not rows:
+            continue
+        print(f"{mode:<10} {len(rows):>6} "
+              f"{statistics.mean(r['wall'] for r in rows):>13.2f} "
+              f"{statistics.mean(r['input_tokens'] for r in rows):>10.0f} "
+              f"{statistics.mean(r['output_tokens'] for r in rows):>11.0f} "
+              f"{statistics.mean(r['calls'] for r in rows):>6.1f} "
+              f"{statistics.mean(r['fill_rate'] for r in rows):>10.0%}")
+
+
+if __name__ == "__main__":
+    max_papers = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    papers = sorted(glob.glob(str(definitions.paper_path) + "/*.pdf"))[:max_papers]
+    if not papers:
+        print(f"No PDFs found in {definitions.paper_path}")
+        sys.exit(1)
+    report(asyncio.run(benchmark(papers)))
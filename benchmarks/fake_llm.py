@@ -0,0 +1,100 @@
+"""
+A deterministic, offline stand-in for the Gemini chat client in `src/nodes.py`.
+
+It answers every prompt the pipeline sends with well-formed JSON for the fields that prompt
+asks about, after a configurable simulated latency, and reports token usage the way the real
+client does. The same prompt always gets the same answer (and the same latency), so runs are
+reproducible and need no network access. With `throttle_rate` set, that share of calls fails
+with a 429-style error instead, to exercise the retry and backoff path of `src/llm.py`.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from langchain_core.messages import AIMessage
+from src import utils
+
+_METADATA_FIELDS = ["title", "authors", "author_affiliations", "publication_date", "year", "journal",
+                    "publisher", "keywords", "doi", "abstract"]
+_LIST_FIELDS = {"authors", "author_affiliations", "keywords", "experimental_methods", "features_used",
+                "data_preprocessing", "metrics"}
+_ANALYSIS_FIELDS = ["proposed_model_name", "methodology", "usp", "experimental_methods",
+                    "problem_statement", "main_findings", "limitations", "future_work",
+                    "dataset_name", "source_type", "granularity_scale", "dataset_duration",
+                    "num_data_points", "data_description",
+                    "train_test_split", "horizon", "resolution", "features_used", "data_preprocessing",
+                    "metrics", "data_availability", "code_availability"]
+
+
+class FakeLLM:
+    """
+    Args:
+        latency: Mean simulated response time in seconds.
+        jitter: Spread of the latency, as a fraction of the mean (uniform).
+        relevant_fraction: Share of papers the relevancy prompt answers `true` for.
+        throttle_rate: Share of calls rejected with a simulated "429 Resource exhausted" error.
+        model: Name reported to the response cache and the metrics.
+    """
+
+    temperature = 0
+
+    def __init__(self, latency: float = 0.5, jitter: float = 0.2, relevant_fraction: float = 0.8,
+                 throttle_rate: float = 0.0, seed: int = 0, model: str = "fake-llm"):
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self.relevant_fraction = relevant_fraction
+        self.throttle_rate = throttle_rate
+        self._rng = random.Random(seed)  # Throttling depends on call order, not the prompt, so retries can succeed
+        self._lock = threading.Lock()
+
+    def _throttle(self):
+        with self._lock:
+            throttled = self._rng.random() < self.throttle_rate
+        if throttled:
+            raise RuntimeError("429 Resource exhausted (simulated)")
+
+    def _seed(self, prompt: str) -> int:
+        return int(hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16], 16)
+
+    def _delay(self, prompt: str) -> float:
+        rng = random.Random(self._seed(prompt))
+        return max(0.0, self.latency * (1 + rng.uniform(-self.jitter, self.jitter)))
+
+    def _answer(self, prompt: str) -> dict:
+        if '"relevancy"' in prompt:
+            return {"relevancy": (self._seed(prompt) % 1000) / 1000 < self.relevant_fraction}
+
+        fields = [f for f in _ANALYSIS_FIELDS if f'"{f}"' in prompt]
+        if not fields and '"doi"' in prompt:
+            fields = _METADATA_FIELDS
+
+        answer = {}
+        for field in fields:
+            if field in _LIST_FIELDS:
+                answer[field] = [f"{field} {i}" for i in range(1, 4)]
+            elif field == "year":
+                answer[field] = 2000 + self._seed(prompt) % 25
+            else:
+                answer[field] = f"Synthetic {field.replace('_', ' ')}"
+        return answer
+
+    def _response(self, prompt: str) -> AIMessage:
+        content = json.dumps(self._answer(prompt))
+        input_tokens = utils.count_tokens(prompt)
+        output_tokens = utils.count_tokens(content)
+        return AIMessage(content=content, usage_metadata={"input_tokens": input_tokens,
+                                                          "output_tokens": output_tokens,
+                                                          "total_tokens": input_tokens + output_tokens})
+
+    def invoke(self, prompt: str) -> AIMessage:
+        self._throttle()
+        time.sleep(self._delay(prompt))
+        return self._response(prompt)
+
+    async def ainvoke(self, prompt: str) -> AIMessage:
+        self._throttle()
+        await asyncio.sleep(self._delay(prompt))
+        return self._response(prompt)
@@ -0,0 +1,163 @@
+"""
+Offline end-to-end benchmark of the whole pipeline, for catching performance regressions.
+
+A synthetic corpus is generated with PyMuPDF (see `synthetic_corpus.py`), the Gemini client is
+swapped for the deterministic `FakeLLM`, and `main.main()` is run over the corpus exactly as in
+production - fingerprinting, prefetch, OCR, the graph and the database writes. The survey DB,
+both caches and the trace all live in a temporary directory, so nothing in `db/` is touched and
+no network access is needed (Tesseract must be installed locally for scanned pages).
+
+Reported: papers/min, LLM throughput and retries, time per stage (from the tracing spans), database write time and peak RSS.
+
+Run from the repository root:
+    python -m benchmarks.pipeline --papers 20 --pages 6 14 --scanned 0.1 --latency 0.5
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")  # The real client is never called
+
+import definitions
+import main
+from src import nodes, database, llm, llm_cache, tracing
+from src.text_cache import text_cache
+from benchmarks import synthetic_corpus, fake_llm
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak RSS is then not reported
+    resource = None
+
+
+def _isolate(workdir: str):
+    """Points the survey DB, both caches, the checkpoints and the trace output at `workdir`."""
+    database.DB_PATH = os.path.join(workdir, "survey.db")
+    for cache, file_name in ((text_cache, "text_cache.db"), (llm_cache.response_cache, "llm_cache.db")):
+        cache.path = os.path.join(workdir, file_name)
+        cache._conn = None
+    definitions.TRACE_DIR = os.path.join(workdir, "traces")
+    definitions.CHECKPOINT_PATH = os.path.join(workdir, "checkpoints.db")
+
+
+def _peak_rss_mb() -> tuple:
+    """(this process, largest child process) peak resident set size in MB."""
+    if resource is None:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    scale = 1024 * 1024 if os.uname().sysname == "Darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+def _stage_times(spans: list) -> dict:
+    """Total and mean seconds per span name."""
+    stages = {}
+    for span in spans:
+        entry = stages.setdefault(span["name"], {"count": 0, "total": 0.0})
+        entry["count"] += 1
+        entry["total"] += span["dur"] / 1e6
+    for entry in stages.values():
+        entry["mean"] = entry["total"] / entry["count"]
+    return stages
+
+
+def benchmark(workdir: str, papers: int = 20, pages: tuple = (6, 14), scanned: float = 0.1,
+              latency: float = 0.5, in_flight: int = None, mode: str = None, seed: int = 0,
+              verbose: bool = False, throttle: float = 0.0, rpm: int = None, relevancy_first: bool = False) -> dict:
+    corpus_dir = os.path.join(workdir, "papers")
+    start = time.perf_counter()
+    corpus = synthetic_corpus.make_corpus(corpus_dir, papers, pages, scanned, seed)
+    generation = time.perf_counter() - start
+
+    _isolate(workdir)
+    definitions.paper_path = corpus_dir
+    definitions.TRACING = True
+    if in_flight is not None:
+        definitions.MAX_IN_FLIGHT_PAPERS = in_flight
+    if mode is not None:
+        definitions.EXTRACTION_MODE = mode
+    if relevancy_first:
+        definitions.RELEVANCY_FIRST = True
+    nodes.gemini = fake_llm.FakeLLM(latency=latency, throttle_rate=throttle, seed=seed)
+    nodes.gemini_flash = fake_llm.FakeLLM(latency=latency / 4, throttle_rate=throttle, seed=seed + 1,
+                                          model="fake-llm-flash")
+    # The fake model has no quota; the production per-minute limits only apply when asked for.
+    llm.governor.requests = llm.TokenBucket(rpm) if rpm else None
+    llm.governor.tokens = None
+    tracing.reset()
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    start = time.perf_counter()
+    with output:
+        main.main()
+    wall = time.perf_counter() - start
+
+    self_rss, child_rss = _peak_rss_mb()
+    return {"papers": len(corpus),
+            "pages": sum(p["pages"] for p in corpus),
+            "scanned_pages": sum(len(p["scanned_pages"]) for p in corpus),
+            "generation": generation,
+            "wall": wall,
+            "papers_per_min": len(corpus) / wall * 60 if wall else 0.0,
+            "stages": _stage_times(tracing.events()),
+            "llm": llm.governor.summarise(),
+            "peak_rss_mb": self_rss,
+            "peak_child_rss_mb": child_rss}
+
+
+def report(results: dict):
+    print(f"--- Offline pipeline benchmark: {results['papers']} papers, {results['pages']} pages "
+          f"({results['scanned_pages']} scanned), in-flight {definitions.MAX_IN_FLIGHT_PAPERS}, "
+          f"mode {definitions.EXTRACTION_MODE}, {'relevancy first' if definitions.RELEVANCY_FIRST else 'full text first'} ---")
+    print(f"    Corpus generated in {results['generation']:.1f}s (not counted)")
+    print(f"    Wall time: {results['wall']:.1f}s | {results['papers_per_min']:.1f} papers/min")
+
+    governor = results["llm"]
+    print(f"    LLM: {governor['calls']} calls, {governor['calls_per_min']:.1f} calls/min, "
+          f"{governor['retries']} retries ({governor['throttled']} throttled), "
+          f"concurrency {governor['min_limit']}-{definitions.MAX_IN_FLIGHT_LLM_REQUESTS}")
+
+    db_write = results["stages"].get("db_write")
+    if db_write:
+        print(f"    DB writes: {db_write['total']:.2f}s total, {db_write['mean'] * 1000:.1f} ms per paper")
+    if results["peak_rss_mb"] is not None:
+        print(f"    Peak RSS: {results['peak_rss_mb']:.0f} MB (main process), "
+              f"{results['peak_child_rss_mb']:.0f} MB (largest worker)")
+
+    print(f"    {'stage':<28} {'count':>6} {'total s':>9} {'mean ms':>9}")
+    for name, entry in sorted(results["stages"].items(), key=lambda item: -item[1]["total"]):
+        print(f"    {name:<28} {entry['count']:>6} {entry['total']:>9.2f} {entry['mean'] * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end pipeline benchmark")
+    parser.add_argument("--papers", type=int, default=20, help="number of synthetic papers")
+    parser.add_argument("--pages", type=int, nargs=2, default=(6, 14), metavar=("MIN", "MAX"),
+                        help="page count range per paper")
+    parser.add_argument("--scanned", type=float, default=0.1, help="fraction of pages without a text layer")
+    parser.add_argument("--latency", type=float, default=0.5, help="simulated LLM latency in seconds")
+    parser.add_argument("--in-flight", type=int, default=None, help="overrides MAX_IN_FLIGHT_PAPERS")
+    parser.add_argument("--mode", choices=["fanout", "combined"], default=None, help="overrides EXTRACTION_MODE")
+    parser.add_argument("--throttle", type=float, default=0.0, help="fraction of LLM calls rejected with a 429")
+    parser.add_argument("--rpm", type=int, default=None, help="requests-per-minute quota (default: none)")
+    parser.add_argument("--relevancy-first", action="store_true",
+                        help="decide relevancy from the first pages before reading the full text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="keep the temporary corpus, DB and trace")
+    parser.add_argument("--verbose", action="store_true", help="show the pipeline's own output")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="pipeline-bench-")
+    try:
+        report(benchmark(workdir, args.papers, tuple(args.pages), args.scanned, args.latency,
+                         args.in_flight, args.mode, args.seed, args.verbose, args.throttle, args.rpm, args.relevancy_first))
+    finally:
+        if args.keep:
+            print(f"    Files kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,101 @@
+"""
+Generates synthetic research papers as PDFs with PyMuPDF, for offline benchmarks.
+
+Each paper has a title page (title, abstract, keywords), numbered sections and a reference
+list, spread over a configurable number of pages. A fraction of the pages can be "scanned":
+rendered to an image and inserted without a text layer, so they go through the OCR path.
+Everything is driven by a seed, so the same arguments always produce the same corpus.
+"""
+import os
+import random
+import pymupdf
+
+_WORDS = ("forecasting model series temporal load demand network attention horizon error "
+          "seasonal trend residual weather feature dataset training validation hourly daily "
+          "regression baseline transformer recurrent convolution ensemble uncertainty quantile "
+          "benchmark accuracy energy traffic sensor signal window lag encoder decoder").split()
+
+_SECTIONS = ["1. Introduction", "2. Methodology", "3. Data", "4. Experimental setup",
+             "5. Results and discussion", "6. Conclusion"]
+
+_PAGE_RECT = pymupdf.paper_rect("a4")
+_MARGIN = 56
+
+
+def _sentences(rng: random.Random, count: int) -> str:
+    sentences = []
+    for _ in range(count):
+        words = rng.choices(_WORDS, k=rng.randint(8, 20))
+        sentences.append(" ".join(words).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def _page_blocks(rng: random.Random, index: int, n_pages: int, title: str) -> list:
+    """The text of one page as a list of paragraphs, so that the sections cover all the pages."""
+    blocks = []
+    if index == 0:
+        blocks += [title, "Abstract", _sentences(rng, 6),
+                   "Keywords: " + ", ".join(rng.sample(_WORDS, 5))]
+
+    # Sections are dealt out over the pages in order; the last page also holds the references.
+    per_page = max(1, -(-len(_SECTIONS) // n_pages))
+    for heading in _SECTIONS[index * per_page:(index + 1) * per_page]:
+        blocks += [heading, _sentences(rng, 10)]
+    if index >= len(_SECTIONS) // per_page and index < n_pages - 1:
+        blocks.append(_sentences(rng, 14))  # Extra body text on the pages after the last section
+
+    if index == n_pages - 1:
+        blocks.append("References")
+        blocks += [f"[{i}] {_sentences(rng, 1)}" for i in range(1, 9)]
+    return blocks
+
+
+def _text_page(doc, blocks: list):
+    page = doc.new_page(width=_PAGE_RECT.width, height=_PAGE_RECT.height)
+    rect = pymupdf.Rect(_MARGIN, _MARGIN, _PAGE_RECT.width - _MARGIN, _PAGE_RECT.height - _MARGIN)
+    page.insert_textbox(rect, "\n\n".join(blocks), fontsize=9)
+    return page
+
+
+def _scanned_page(doc, blocks: list, dpi: int):
+    """Renders the page in a scratch document and inserts only the image, with no text layer."""
+    scratch = pymupdf.open()
+    pixmap = _text_page(scratch, blocks).get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY, alpha=False)
+    scratch.close()
+    page = doc.new_page(width=_PAGE_RECT.width, height=_PAGE_RECT.height)
+    page.insert_image(page.rect, pixmap=pixmap)
+
+
+def make_paper(path: str, seed: int, n_pages: int = 8, scanned_fraction: float = 0.0, dpi: int = 150) -> dict:
+    """Writes one synthetic paper to `path` and returns a short description of it."""
+    rng = random.Random(seed)
+    title = _sentences(rng, 1).rstrip(".")
+    scanned = {i for i in range(n_pages) if rng.random() < scanned_fraction}
+
+    doc = pymupdf.open()
+    for index in range(n_pages):
+        blocks = _page_blocks(rng, index, n_pages, title)
+        if index in scanned:
+            _scanned_page(doc, blocks, dpi)
+        else:
+            _text_page(doc, blocks)
+    doc.set_metadata({"title": title, "author": "Synthetic Author", "subject": "Benchmark paper"})
+    doc.save(path)
+    doc.close()
+    return {"path": path, "pages": n_pages, "scanned_pages": sorted(scanned)}
+
+
+def make_corpus(directory: str, n_papers: int, pages: tuple = (6, 14), scanned_fraction: float = 0.1,
+                seed: int = 0) -> list:
+    """
+    Writes `n_papers` PDFs into `directory`, with page counts drawn from the `pages` range and
+    roughly `scanned_fraction` of all pages image-only. Returns one description per paper.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    papers = []
+    for i in range(n_papers):
+        path = os.path.join(directory, f"{i + 1:04d}_synthetic.pdf")
+        papers.append(make_paper(path, seed=rng.randrange(2 ** 32), n_pages=rng.randint(*pages),
+                                 scanned_fraction=scanned_fraction))
+    return papers
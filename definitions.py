@@ -7,3 +7,93 @@ DB_PATH = Path('db', 'survey.db')
 TABLE_NAME = "survey"
 
 TESSERACT_CMD_PATH = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+
+# --- Concurrent runner (main.py) ---
+MAX_IN_FLIGHT_PAPERS = 8            # Papers driven through the graph at the same time (1 = sequential loop)
+MAX_IN_FLIGHT_LLM_REQUESTS = 16     # Upper bound on concurrent Gemini requests across all papers
+ORDERED_RESULTS = False             # True: save/print results in file order; False: as soon as each paper finishes
+
+# --- LLM rate limits, retries and adaptive concurrency (src/llm.py) ---
+LLM_REQUESTS_PER_MINUTE = 150       # Provider quota for the model in use (None = unlimited)
+LLM_TOKENS_PER_MINUTE = 2_000_000   # Input + output tokens per minute (None = unlimited)
+LLM_EXPECTED_OUTPUT_TOKENS = 1000   # Reserved per call until the real usage is known
+LLM_MAX_RETRIES = 5                 # Retries of a throttled, timed-out or temporarily failing call
+LLM_BACKOFF_BASE_S = 2.0            # Backoff before retry n is uniform in [0, min(max, base * 2**n)]
+LLM_BACKOFF_MAX_S = 60.0
+LLM_TIMEOUT_S = 120                 # Per-request timeout of the Gemini client
+LLM_MIN_IN_FLIGHT = 1               # Floor for the adaptive concurrency limit
+LLM_AIMD_DECREASE = 0.5             # Concurrency is multiplied by this when the provider throttles us
+LLM_AIMD_COOLDOWN_S = 10.0          # At most one decrease per cool-down
+
+# --- LLM response cache ---
+LLM_CACHE_PATH = Path('db', 'llm_cache.db')
+LLM_CACHE_MAX_BYTES = 512 * 1024 * 1024                             # Least recently used answers are evicted beyond this
+LLM_CACHE_BYPASS = os.environ.get("LLM_CACHE_BYPASS", "0") == "1"   # Always call the model (answers are still stored)
+
+# --- Extracted text cache ---
+TEXT_CACHE_PATH = Path('db', 'text_cache.db')
+TEXT_EXTRACTOR_VERSION = 4          # Bump whenever text/OCR/landmark extraction changes, to invalidate old entries
+# Text extraction stops at the first of these headings (on a line of its own); later pages are never read.
+TEXT_STOP_HEADINGS = [
+    "References",
+    # "Acknowledgements",
+    # "Acknowledgments",
+    # "CRediT authorship contribution statement",
+    # "Author contributions",
+    # "Appendix",
+]
+
+# --- Extraction prefetch stage (concurrent runner) ---
+PREFETCH_DEPTH = 8                                      # Papers extracted ahead of the LLM stage (0 = extract inside the graph)
+PREFETCH_WORKERS = max(1, (os.cpu_count() or 2) - 1)    # Worker processes for text extraction and OCR
+
+# --- OCR ---
+OCR_MIN_TEXT_DENSITY = 1.0                          # Non-blank characters per square inch below which a page counts as scanned
+OCR_TARGET_LONG_SIDE_PX = 3300                      # Render size of the page's long side (300 dpi on A4/Letter)
+OCR_MIN_DPI = 150
+OCR_MAX_DPI = 400
+OCR_WORKERS = max(1, (os.cpu_count() or 2) - 1)     # Worker processes for multi-page OCR
+
+# --- Context selection for the four parallel extractors ---
+CONTEXT_SELECTION = True            # False sends the full paper text to every extractor (the original behaviour)
+CONTEXT_TOKEN_BUDGETS = {           # Max input tokens of paper text per extractor (None = no limit)
+    "methodology": 12000,
+    "analysis": 10000,
+    "dataset": 8000,
+    "experiments": 10000,
+    "combined": 24000,
+}
+
+# --- Extraction mode for relevant papers ---
+EXTRACTION_MODE = "fanout"          # "fanout": four parallel calls (lower latency); "combined": one call (fewer input tokens)
+
+# --- Relevancy cascade: lexical prefilter -> fast model -> large model (src/relevancy.py) ---
+RELEVANCY_CASCADE = True            # False asks the large model about every paper (the original behaviour)
+RELEVANCY_FLASH_MODEL = "gemini-2.5-flash"
+RELEVANCY_MIN_LABELS = 40           # Abstracts labelled by the large model needed before the prefilter decides anything
+RELEVANCY_MIN_PER_CLASS = 10        # ...of which at least this many relevant and this many not
+RELEVANCY_PREFILTER_PRECISION = 0.97    # Cross-validated precision required of the prefilter's own verdicts
+RELEVANCY_AUDIT_RATE = 0.05         # Share of clear-cut papers still sent to the LLMs to measure agreement
+RELEVANCY_COLD_START_RATE = 0.25    # Before the prefilter is trained: share of papers the large model rules on
+                                    # after the fast one, which is where the prefilter's labels come from
+
+# --- Graph order ---
+RELEVANCY_FIRST = False             # Decide relevancy from the first pages; read the full text and complete metadata only for relevant papers
+HEAD_PAGES = 2                      # Pages read before the relevancy decision (title block and abstract)
+HEAD_FALLBACK_CHARS = 3000          # Start of the first page used for the relevancy check when no abstract is found
+
+# --- LLM cost estimates (USD per 1M tokens: input, output) ---
+MODEL_PRICING = {
+    "gemini-2.5-pro": (1.25, 10.00),
+    "gemini-2.5-flash": (0.30, 2.50),
+    "gemini-2.5-flash-lite": (0.10, 0.40),
+}
+
+# --- Node-level checkpoints (needs langgraph-checkpoint-sqlite) ---
+CHECKPOINTING = True                # Resume interrupted papers from their last completed node
+CHECKPOINT_PATH = Path('db', 'checkpoints.db')
+
+# --- Tracing ---
+TRACING = os.environ.get("TRACE", "0") == "1"       # Record a span for every node execution
+TRACE_DIR = Path("traces")
+TRACE_FORMAT = "chrome"                             # "chrome" (chrome://tracing / Perfetto) or "jsonl"
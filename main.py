@@ -1,6 +1,6 @@
-from src import initialise_state, database
+from src import initialise_state, database, document
 from src.graph import create_graph
-from src import utils
+from src import utils, runner, llm, llm_cache, context, metrics, relevancy, tracing, checkpoint
 import definitions
 import glob
 import os
@@ -13,19 +13,41 @@ def main():
     # --- Setup ---
     # database.reinitialize_database() # Uncomment to wipe the DB on startup
     database.create_database()
-    graph = create_graph()
+    graph = create_graph(use_async=definitions.MAX_IN_FLIGHT_PAPERS > 1)
 
     # --- Ingestion: Just get the list of files ---
     path = definitions.paper_path # Or your rename_path
     paper_list = glob.glob(str(path) + "/*.pdf")
 
-    # --- Processing Loop ---
-    for paper_path in paper_list:  # iterate through the files
-        file_name = os.path.basename(paper_path)
+    # --- Identity: papers are recognised by content hash, not by file name ---
+    # Renamed, moved or duplicated PDFs map onto the same fingerprint and are never re-analysed.
+    fingerprints = {paper_path: utils.file_fingerprint(paper_path) for paper_path in paper_list}
+    database.sync_manifest(fingerprints)
 
-        if database.paper_exists(paper_path):
+    processed = database.processed_fingerprints()
+    pending = []
+    seen = set()
+    for paper_path, fingerprint in fingerprints.items():
+        file_name = os.path.basename(paper_path)
+        if fingerprint in seen:
+            print(f"--- SKIPPING {file_name}: Duplicate of another file in this run. ---\n")
+            continue
+        seen.add(fingerprint)
+        if fingerprint in processed:
             print(f"--- SKIPPING {file_name}: Already in database. ---\n")
             continue
+        pending.append((paper_path, fingerprint))
+
+    # --- Concurrent Processing ---
+    # Several papers are driven through the graph at once; results are written by a single writer.
+    if definitions.MAX_IN_FLIGHT_PAPERS > 1:
+        runner.run(graph, pending)
+        _report()
+        return
+
+    # --- Processing Loop ---
+    for paper_path, fingerprint in pending:  # iterate through the files
+        file_name = os.path.basename(paper_path)
 
         print(f"------------------------------------------------------------------------")
         print(f"--- PROCESSING {file_name}: {paper_path} ---")
@@ -33,18 +55,41 @@ def main():
         # 2. Set up the initial state for the graph
         initial_state = initialise_state.initialise_state()
         initial_state['path'] = paper_path
+        initial_state['fingerprint'] = fingerprint
 
-        # 3. Invoke the graph to run the full pipeline
-        final_state = graph.invoke(initial_state)
+        # 3. Invoke the graph to run the full pipeline (the PDF is opened once and closed afterwards).
+        # An earlier interrupted run of this paper resumes from its last checkpoint.
+        with document.paper_session(paper_path):
+            final_state = checkpoint.invoke(graph, initial_state)
         utils.pretty_print_dict(final_state)
 
         # 4. Save the results
-        if final_state.get('relevancy') is True:
-            database.upsert_paper(final_state)
+        relevant = final_state.get('relevancy') is True
+        with tracing.span("db_write", file_name):
+            committed = database.save_results([(paper_path, final_state, relevant)])
+        if not committed:
+            continue  # Its checkpoint is kept, so the next run saves it without calling the LLMs again
+        checkpoint.prune([fingerprint])
+        if relevant:
             print(f"--- Saved relevant paper {file_name} to database. ---\n")
         else:
             print(f"--- Discarded paper {file_name} - not relevant. ---\n")
 
+    _report()
+
+
+def _report():
+    """End-of-run summaries: cache effectiveness, context savings, per-node LLM metrics, the relevancy
+    cascade, throughput and the trace."""
+    metrics.flush()
+    llm_cache.response_cache.report()
+    context.report()
+    metrics.report(metrics.RUN_ID)
+    relevancy.report(metrics.RUN_ID)
+    llm.governor.report()
+    tracing.save(metrics.RUN_ID)
+    database.close_connection()
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,30 @@
+import streamlit as st
+from src.streamlit_utils import search_papers
+
+st.set_page_config(layout="wide", page_title="Search")
+
+st.title("🔎 Search Papers")
+st.markdown("Full-text search over titles, abstracts, problem statements, methodologies, findings and limitations.")
+
+# check to ensure the session state is initialized.
+if 'db_path' not in st.session_state:
+    st.warning("Please navigate to the main 'Paper Explorer' page first to connect to the database.")
+    st.stop()  # Stop the page from rendering further
+
+RESULTS_PER_PAGE = 20
+
+query = st.text_input("Search", placeholder="e.g. water demand lstm", label_visibility="collapsed")
+
+if query.strip():
+    page = st.number_input("Page", min_value=1, value=1, step=1)
+    results = search_papers(st.session_state.db_path, query, RESULTS_PER_PAGE, (page - 1) * RESULTS_PER_PAGE)
+
+    if not results:
+        st.info("No papers match this search.")
+
+    for result in results:
+        year = f" ({result['year']})" if result['year'] else ""
+        st.subheader(f"{result['display_title'] or result['path']}{year}")
+        st.markdown(result['snippet'] or "")
+        st.caption(f"Relevance: {-result['score']:.2f}")
+        st.markdown("---")
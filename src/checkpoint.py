@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+import threading
+import definitions
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:  # langgraph-checkpoint-sqlite is optional; without it papers are simply not checkpointed
+    SqliteSaver = None
+
+# Node-level checkpoints, so a paper whose run was interrupted (crash, Ctrl-C, network loss)
+# resumes after the last completed node instead of starting over. Each paper is its own
+# LangGraph thread, keyed by its fingerprint; the thread is deleted once the paper is saved.
+
+
+if SqliteSaver is not None:
+    class _ThreadedSqliteSaver(SqliteSaver):
+        """
+        The SQLite saver, usable from the async graph too: the async methods run the sync ones
+        in a worker thread, so it can be created (and the graph compiled) outside the event loop.
+        """
+
+        async def aget_tuple(self, config):
+            return await asyncio.to_thread(self.get_tuple, config)
+
+        async def alist(self, config, **kwargs):
+            for item in await asyncio.to_thread(lambda: list(self.list(config, **kwargs))):
+                yield item
+
+        async def aput(self, config, checkpoint, metadata, new_versions):
+            return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+        async def aput_writes(self, config, writes, task_id, task_path: str = ""):
+            return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+        async def adelete_thread(self, thread_id):
+            return await asyncio.to_thread(self.delete_thread, thread_id)
+
+
+_saver = None
+_lock = threading.Lock()
+
+
+def get_saver():
+    """The shared checkpointer, or None when checkpointing is off or the package is missing."""
+    global _saver
+    if not definitions.CHECKPOINTING or SqliteSaver is None:
+        return None
+    with _lock:
+        if _saver is None:
+            conn = sqlite3.connect(definitions.CHECKPOINT_PATH, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            _saver = _ThreadedSqliteSaver(conn)
+    return _saver
+
+
+def thread_config(fingerprint: str) -> dict:
+    return {"configurable": {"thread_id": fingerprint}}
+
+
+def _resume_point(snapshot, paper_path: str):
+    """Returns ("fresh" | "resume" | "done", state) for the paper's last checkpoint."""
+    if snapshot is None or not snapshot.values:
+        return "fresh", None
+    if snapshot.next:
+        print(f"--- RESUMING from checkpoint before: {', '.join(snapshot.next)} ---")
+        return "resume", None
+    # The graph finished last time but the process died before the result was saved.
+    print("--- Using the completed checkpoint; the graph does not need to run again. ---")
+    return "done", dict(snapshot.values, path=paper_path)
+
+
+def invoke(graph, initial_state: dict) -> dict:
+    """Runs `graph` for one paper, resuming from its checkpoint when an earlier run was interrupted."""
+    if graph.checkpointer is None:
+        return graph.invoke(initial_state)
+
+    config = thread_config(initial_state['fingerprint'])
+    point, final_state = _resume_point(graph.get_state(config), initial_state['path'])
+    if point == "done":
+        return final_state
+    final_state = graph.invoke(initial_state if point == "fresh" else None, config)
+    # The file may have been renamed since the checkpoint was taken.
+    return dict(final_state, path=initial_state['path'])
+
+
+async def ainvoke(graph, initial_state: dict) -> dict:
+    """Async version of `invoke`."""
+    if graph.checkpointer is None:
+        return await graph.ainvoke(initial_state)
+
+    config = thread_config(initial_state['fingerprint'])
+    point, final_state = _resume_point(await graph.aget_state(config), initial_state['path'])
+    if point == "done":
+        return final_state
+    final_state = await graph.ainvoke(initial_state if point == "fresh" else None, config)
+    return dict(final_state, path=initial_state['path'])
+
+
+def prune(fingerprints: list):
+    """Deletes the checkpoints of papers whose results are now in the database."""
+    saver = get_saver()
+    if saver is None:
+        return
+    for fingerprint in fingerprints:
+        try:
+            saver.delete_thread(fingerprint)
+        except Exception as e:
+            print(f"--- WARNING: Could not prune checkpoints for {fingerprint[:12]}: {e} ---")
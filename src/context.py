@@ -0,0 +1,125 @@
+import threading
+from src import utils, sections
+import definitions
+
+# Per-extractor context selection: instead of the whole paper, each of the four parallel
+# extractors gets the sections its prompt asks about, capped at a token budget.
+
+# Sections each extractor reads, in priority order (earlier sections survive the budget first).
+EXTRACTOR_SECTIONS = {
+    "methodology": ["abstract", "methodology", "introduction", "experiments"],
+    "analysis": ["abstract", "results", "conclusion", "introduction"],
+    "dataset": ["data", "experiments", "abstract"],
+    "experiments": ["experiments", "data", "results", "methodology"],
+    # Single-call mode: one shared context covering what the four extractors need between them.
+    "combined": ["abstract", "methodology", "data", "experiments", "results", "conclusion", "introduction"],
+}
+
+_SEPARATOR = "\n[...]\n"
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    tokens = utils.count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    # Proportional cut; close enough for a budget, and avoids re-tokenising repeatedly.
+    return text[:int(len(text) * max_tokens / tokens)]
+
+
+def select_context(state: dict, extractor: str) -> str:
+    """
+    Returns the part of the paper text that `extractor` should see.
+
+    The extractor's sections are sliced out of `raw_text` with the section index and kept in
+    document order. If none of them was found (e.g. unnumbered headings the index missed), the
+    full text is used, as before. Either way the result is capped at the extractor's budget in
+    `CONTEXT_TOKEN_BUDGETS`. The full text's token count is taken from 'raw_text_tokens' when the
+    metadata node has counted it, so the extractors do not each re-tokenise the whole paper.
+    """
+    text = state.get('raw_text') or ''
+    budget = definitions.CONTEXT_TOKEN_BUDGETS.get(extractor)
+    full_tokens = state.get('raw_text_tokens')
+    if full_tokens is None:
+        full_tokens = utils.count_tokens(text)
+
+    if not definitions.CONTEXT_SELECTION:
+        _stats.record_tokens(extractor, full_tokens, full_tokens)
+        return text
+
+    section_index = state.get('sections') or []
+    spans = []
+    for name in EXTRACTOR_SECTIONS.get(extractor, []):
+        start, end = sections.section_span(section_index, name, len(text))
+        if start != -1:
+            spans.append((start, end))
+
+    if not spans:
+        selected = text if budget is None else _truncate_to_tokens(text, budget)
+        _stats.record_tokens(extractor, full_tokens, utils.count_tokens(selected))
+        return selected
+
+    # Spend the budget in priority order, then put the kept pieces back in document order.
+    kept = []
+    remaining = budget
+    for start, end in spans:
+        if any(start < k_end and k_start < end for k_start, k_end, _ in kept):
+            continue  # Overlaps a section already kept (e.g. a subsection of it)
+        piece = text[start:end]
+        if remaining is not None:
+            if remaining <= 0:
+                break
+            piece = _truncate_to_tokens(piece, remaining)
+            remaining -= utils.count_tokens(piece)
+        kept.append((start, end, piece))
+
+    selected = _SEPARATOR.join(piece for _, _, piece in sorted(kept))
+    _stats.record_tokens(extractor, full_tokens, utils.count_tokens(selected))
+    return selected
+
+
+class _ContextStats:
+    """Running totals per extractor: paper-text tokens sent vs. the full-text baseline, and LLM latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def _entry(self, extractor: str) -> dict:
+        return self._totals.setdefault(extractor, {"calls": 0, "full_tokens": 0, "selected_tokens": 0,
+                                                   "llm_calls": 0, "latency": 0.0})
+
+    def record_tokens(self, extractor: str, full_tokens: int, selected_tokens: int):
+        with self._lock:
+            entry = self._entry(extractor)
+            entry["calls"] += 1
+            entry["full_tokens"] += full_tokens
+            entry["selected_tokens"] += selected_tokens
+
+    def record_latency(self, extractor: str, seconds: float):
+        with self._lock:
+            entry = self._entry(extractor)
+            entry["llm_calls"] += 1
+            entry["latency"] += seconds
+
+    def report(self):
+        with self._lock:
+            totals = {k: dict(v) for k, v in self._totals.items()}
+        if not totals:
+            return
+
+        mode = "section selection" if definitions.CONTEXT_SELECTION else "full text (baseline)"
+        print(f"--- Extractor context usage ({mode}) ---")
+        for extractor, entry in sorted(totals.items()):
+            if not entry["calls"]:
+                continue
+            saved = 1 - entry["selected_tokens"] / entry["full_tokens"] if entry["full_tokens"] else 0.0
+            latency = entry["latency"] / entry["llm_calls"] if entry["llm_calls"] else 0.0
+            print(f"    {extractor:<12} calls: {entry['calls']:>4} | "
+                  f"avg tokens sent: {entry['selected_tokens'] / entry['calls']:>8.0f} "
+                  f"vs full text: {entry['full_tokens'] / entry['calls']:>8.0f} ({saved:.0%} saved) | "
+                  f"avg LLM latency: {latency:.2f}s")
+
+
+_stats = _ContextStats()
+record_latency = _stats.record_latency
+report = _stats.report
@@ -1,24 +1,160 @@
 import sqlite3
 import json
+import re
+import sys
+import threading
+from contextlib import contextmanager
 from src.initialise_state import State
+from src import display
 from definitions import DB_PATH, TABLE_NAME
 
+MANIFEST_TABLE = "manifest"
+PARKED_PREFIX = "__moved__/"     # Path of survey rows whose PDF is no longer in the papers folder
+METRICS_TABLE = "run_metrics"
+RELEVANCY_TABLE = "relevancy_label"   # Every relevancy verdict with its abstract; training data for src/relevancy.py
+
+# State fields used only by the graph logic; they are never stored.
+INTERNAL_FIELDS = ['messages', 'raw_text', 'head_text', 'landmarks', 'sections', 'raw_text_tokens', 'ocr_needed',
+                   'relevancy_info']
+
+# List fields are also stored one item per row in these child tables, keyed by the paper's
+# fingerprint, so cross-paper questions can be answered in SQL: table -> (state field, column).
+CHILD_TABLES = {
+    "paper_author": ("authors", "name"),
+    "paper_keyword": ("keywords", "keyword"),
+    "paper_method": ("experimental_methods", "method"),
+    "paper_feature": ("features_used", "feature"),
+    "paper_preprocessing": ("data_preprocessing", "step"),
+}
+METRIC_TABLE = "paper_metric"    # One row per reported metric: name, value as written, and its number
+
+# Ready-to-render values computed once at write time (see src/display.py), so the dashboard
+# does no parsing or formatting of its own.
+DISPLAY_COLUMNS = {"paper_id": "INTEGER", "display_title": "TEXT", "authors_display": "TEXT",
+                   "methods_display": "TEXT", "features_display": "TEXT", "preprocessing_display": "TEXT",
+                   "metrics_display": "TEXT"}
+# The stored fields they are computed from.
+DISPLAY_SOURCE_FIELDS = ['path', 'title', 'authors', 'experimental_methods', 'features_used',
+                         'data_preprocessing', 'metrics']
+
+# Full-text search (FTS5) over these text fields, ranked with BM25 using the weights given.
+SEARCH_TABLE = f"{TABLE_NAME}_fts"
+SEARCH_FIELDS = {"title": 10.0, "abstract": 5.0, "problem_statement": 2.0, "methodology": 2.0,
+                 "main_findings": 2.0, "limitations": 1.0}
+
+# Applied to every connection. WAL lets the dashboard read while the pipeline writes;
+# with WAL, synchronous=NORMAL only syncs at checkpoints and is still crash-safe.
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=30000",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-65536",        # 64 MB page cache
+    "PRAGMA mmap_size=268435456",      # 256 MB memory-mapped reads
+)
+
+# --- Connection management ---
+# The pipeline keeps one connection open for the whole run instead of opening one per call.
+# It is shared by all threads; every use goes through _lock, so writes never interleave.
+_lock = threading.RLock()
+_conn = None
+_conn_path = None
+
+
+def _connection() -> sqlite3.Connection:
+    global _conn, _conn_path
+    if _conn is None or _conn_path != str(DB_PATH):
+        if _conn is not None:
+            _conn.close()
+        # Autocommit mode: transactions are opened explicitly by transaction().
+        _conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False, isolation_level=None)
+        for pragma in PRAGMAS:
+            _conn.execute(pragma)
+        _conn_path = str(DB_PATH)
+    return _conn
+
+
+@contextmanager
+def connection():
+    """The shared connection, held exclusively for the duration of the block (for reads)."""
+    with _lock:
+        yield _connection()
+
+
+@contextmanager
+def transaction():
+    """The shared connection inside one write transaction: committed on success, rolled back on error."""
+    with _lock:
+        conn = _connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+def close_connection():
+    """Closes the shared connection (it is reopened on the next call)."""
+    global _conn, _conn_path
+    with _lock:
+        if _conn is not None:
+            _conn.close()
+        _conn = _conn_path = None
+
+
+def connect_readonly(db_path) -> sqlite3.Connection:
+    """
+    Opens a read-only connection for the dashboard. Under WAL it reads the last committed
+    snapshot and never takes a write lock, so the pipeline is not blocked while it is open.
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA query_only=ON")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
 
 def create_database():
     """
     Creates the SQLite database and the 'papers' table if they don't exist.
     The table schema is derived from the State TypedDict, with specific types.
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    with transaction() as conn:
+        cursor = conn.cursor()
+        had_child_tables = _table_exists(cursor, METRIC_TABLE)
+        # Search indexes from before it was keyed on the fingerprint are dropped and rebuilt.
+        had_search_index = 'fingerprint' in _columns(cursor, SEARCH_TABLE)
+        if not had_search_index:
+            cursor.execute(f"DROP TABLE IF EXISTS {SEARCH_TABLE}")
+        had_display_columns = 'paper_id' in _columns(cursor, TABLE_NAME)
+        _create_tables(cursor)
+        # Existing databases: fill tables added since they were created from the survey rows, once.
+        if not had_child_tables:
+            _rebuild_child_tables(cursor)
+        if not had_search_index:
+            _rebuild_search_index(cursor)
+        if not had_display_columns:
+            _refresh_display_columns(cursor)
+    print("Database and table are ready.")
 
+
+def _table_exists(cursor, name: str) -> bool:
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _columns(cursor, table: str) -> list:
+    return [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+
+
+def _create_tables(cursor):
     # --- Define schema with specific types ---
     fields = []
 
     # Generate the CREATE TABLE SQL command dynamically from the State keys
     # This makes it easy to update if you add more fields to your State
     fields_ = [k for k in State.__annotations__.keys() if
-                   k not in ['messages', 'raw_text', 'landmarks', 'ocr_needed']]
+                   k not in INTERNAL_FIELDS]
 
     for key in fields_:
         if key == 'path':
@@ -38,32 +174,115 @@ def create_database():
                             """
 
     cursor.execute(create_table_sql)
-    conn.commit()
-    conn.close()
-    print("Database and table are ready.")
+
+    # Databases created before fingerprints existed are missing the column; add it in place.
+    existing_columns = _columns(cursor, TABLE_NAME)
+    if 'fingerprint' not in existing_columns:
+        cursor.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN fingerprint TEXT")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_fingerprint ON {TABLE_NAME} (fingerprint)")
+
+    # Display columns are not State fields; add any that are missing (also on older databases).
+    for column, column_type in DISPLAY_COLUMNS.items():
+        if column not in existing_columns:
+            cursor.execute(f"ALTER TABLE {TABLE_NAME} ADD COLUMN {column} {column_type}")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_paper_id ON {TABLE_NAME} (paper_id)")
+    # The dashboard's comparison table filters and sorts by year in SQL.
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{TABLE_NAME}_year ON {TABLE_NAME} (year)")
+
+    # The manifest maps every PDF we have seen (by content hash) to where it currently lives,
+    # and remembers the relevancy verdict so discarded papers are not re-analysed either.
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+                        fingerprint TEXT PRIMARY KEY,
+                        path        TEXT,
+                        relevancy   INTEGER,
+                        updated_at  TEXT DEFAULT CURRENT_TIMESTAMP
+                        );
+                        """)
+
+    # One row per LLM call, written in batches by src/metrics.py.
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {METRICS_TABLE} (
+                        run_id        TEXT,
+                        created_at    REAL,
+                        node          TEXT,
+                        fingerprint   TEXT,
+                        model         TEXT,
+                        input_tokens  INTEGER,
+                        output_tokens INTEGER,
+                        latency       REAL,
+                        retries       INTEGER,
+                        cached        INTEGER,
+                        cost          REAL
+                        );
+                        """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{METRICS_TABLE}_run ON {METRICS_TABLE} (run_id)")
+
+    # One row per paper: the relevancy verdict, which tier of the cascade made it, and what the
+    # lexical prefilter and the fast model said, so agreement can be measured across runs.
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {RELEVANCY_TABLE} (
+                        fingerprint   TEXT PRIMARY KEY,
+                        run_id        TEXT,
+                        abstract      TEXT,
+                        relevancy     INTEGER,
+                        decided_by    TEXT,
+                        lexical_score REAL,
+                        lexical_lean  INTEGER,
+                        prefilter_verdict INTEGER,
+                        flash_verdict INTEGER,
+                        created_at    TEXT DEFAULT CURRENT_TIMESTAMP
+                        );
+                        """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{RELEVANCY_TABLE}_run ON {RELEVANCY_TABLE} (run_id)")
+
+    # Normalised list fields (written with the survey row, see _write_child_rows).
+    for table, (_, column) in CHILD_TABLES.items():
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS {table} (
+                            fingerprint TEXT NOT NULL,
+                            position    INTEGER,
+                            {column}    TEXT
+                            );
+                            """)
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_fingerprint ON {table} (fingerprint)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{column} ON {table} ({column} COLLATE NOCASE, fingerprint)")
+
+    cursor.execute(f"""CREATE TABLE IF NOT EXISTS {METRIC_TABLE} (
+                        fingerprint TEXT NOT NULL,
+                        position    INTEGER,
+                        name        TEXT,
+                        value       TEXT,
+                        value_num   REAL,
+                        model       TEXT
+                        );
+                        """)
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{METRIC_TABLE}_fingerprint ON {METRIC_TABLE} (fingerprint)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{METRIC_TABLE}_name ON {METRIC_TABLE} (name COLLATE NOCASE, value_num)")
+
+    # Search index, keyed on the paper's fingerprint like the child tables: survey rowids are
+    # renumbered by REPLACE and VACUUM, and paths change when files are renumbered. The key column
+    # comes last so the BM25 weights in SEARCH_FIELDS line up with the searched columns.
+    cursor.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE}
+                      USING fts5({', '.join(SEARCH_FIELDS)}, fingerprint UNINDEXED,
+                                 tokenize = 'porter unicode61')""")
 
 
 def reinitialize_database():
     """
     Completely wipes and reinitializes the database.
-    This function will drop the 'papers' table if it exists, deleting all data,
-    and then create a new, empty table.
+    This function will drop the 'papers' table and every table derived from or logged alongside
+    it (manifest, child tables, search index, relevancy labels, run metrics), deleting all data,
+    and then create new, empty tables.
     """
-    # Connect to the database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
     print(f"--- Reinitializing Database: Dropping table '{TABLE_NAME}'... ---")
 
     # SQL command to drop the table. "IF EXISTS" prevents errors if the table isn't there.
     drop_table_sql = f"DROP TABLE IF EXISTS {TABLE_NAME}"
 
-    # Execute the command
-    cursor.execute(drop_table_sql)
-
-    # Commit the change (the table is now gone)
-    conn.commit()
-    conn.close()
+    # Execute the command (committed when the block ends; the table is then gone)
+    with transaction() as conn:
+        conn.execute(drop_table_sql)
+        conn.execute(f"DROP TABLE IF EXISTS {MANIFEST_TABLE}")
+        # Relevancy labels would otherwise keep training the prefilter on papers that are gone.
+        for table in list(CHILD_TABLES) + [METRIC_TABLE, SEARCH_TABLE, RELEVANCY_TABLE, METRICS_TABLE]:
+            conn.execute(f"DROP TABLE IF EXISTS {table}")
 
     print(f"--- Table '{TABLE_NAME}' successfully dropped. ---")
 
@@ -83,8 +302,7 @@ def prepare_data_for_db(data: State) -> dict:
 
     # --- 1. Remove Internal Fields ---
     # These fields are for graph logic only and should not be stored.
-    fields_to_remove = ['messages', 'raw_text', 'landmarks', 'ocr_needed']
-    for field in fields_to_remove:
+    for field in INTERNAL_FIELDS:
         prepared_data.pop(field, None)
 
     # --- 2. Perform Type Conversions ---
@@ -117,54 +335,419 @@ def prepare_data_for_db(data: State) -> dict:
     return prepared_data
 
 
-def upsert_paper(data: State):
-    """
-    Inserts a new paper record or replaces an existing one.
-    It now uses the prepare_data_for_db function first.
-    """
-    # --- THIS IS THE KEY CHANGE ---
+def _upsert(cursor, data: State):
     data_to_insert = prepare_data_for_db(data)
-
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    data_to_insert.update(display.display_columns(data_to_insert))
 
     columns = ', '.join(data_to_insert.keys())
     placeholders = ', '.join(['?'] * len(data_to_insert))
 
     sql = f"INSERT OR REPLACE INTO {TABLE_NAME} ({columns}) VALUES ({placeholders})"
+    cursor.execute(sql, list(data_to_insert.values()))
+    _index_for_search(cursor, data_to_insert)
+    _write_child_rows(cursor, data.get('fingerprint'), data)
 
-    try:
-        cursor.execute(sql, list(data_to_insert.values()))
-        conn.commit()
-        print(f"--- SUCCESS: Saved data for: {data['path']} to database. ---")
-    except sqlite3.Error as e:
-        print(f"--- DATABASE ERROR: Failed to upsert data for {data['path']}. Error: {e} ---")
-    finally:
-        conn.close()
+
+# --- Materialised display columns ---
+
+def _refresh_display_columns(cursor, fingerprints: list = None, paths: list = None):
+    """
+    Recomputes the display columns of the given papers, by fingerprint and/or path (all papers
+    when neither is given), from their stored fields.
+    """
+    query = f"SELECT rowid, {', '.join(DISPLAY_SOURCE_FIELDS)} FROM {TABLE_NAME}"
+    if fingerprints is None and paths is None:
+        rows = cursor.execute(query).fetchall()
+    else:
+        rows = []
+        for fingerprint in fingerprints or []:
+            rows += cursor.execute(query + " WHERE fingerprint = ?", (fingerprint,)).fetchall()
+        for path in paths or []:
+            rows += cursor.execute(query + " WHERE path = ?", (path,)).fetchall()
+
+    assignments = ", ".join(f"{column} = ?" for column in DISPLAY_COLUMNS)
+    cursor.executemany(f"UPDATE {TABLE_NAME} SET {assignments} WHERE rowid = ?",
+                       [list(display.display_columns(dict(zip(DISPLAY_SOURCE_FIELDS, row[1:]))).values()) + [row[0]]
+                        for row in rows])
+    return len(rows)
+
+
+def backfill():
+    """
+    Recomputes everything derived from the survey rows: display columns, child tables and the
+    search index. Run it after upgrading an existing database:
+
+        python -m src.database backfill
+    """
+    with transaction() as conn:
+        cursor = conn.cursor()
+        count = _refresh_display_columns(cursor)
+        _rebuild_child_tables(cursor)
+        _rebuild_search_index(cursor)
+    print(f"--- Backfilled display columns, child tables and search index for {count} papers. ---")
+
+
+# --- Full-text search ---
+
+def _index_for_search(cursor, row: dict):
+    """Replaces the paper's search entry. Papers without a fingerprint are not indexed."""
+    if not row.get('fingerprint'):
+        return
+    cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE fingerprint = ?", (row['fingerprint'],))
+    cursor.execute(f"INSERT INTO {SEARCH_TABLE} ({', '.join(SEARCH_FIELDS)}, fingerprint) "
+                   f"VALUES ({', '.join(['?'] * (len(SEARCH_FIELDS) + 1))})",
+                   [row.get(field) or "" for field in SEARCH_FIELDS] + [row['fingerprint']])
+
+
+def _rebuild_search_index(cursor, fingerprints: list = None):
+    """Re-indexes the given papers (all papers when None) from the survey table."""
+    columns = ", ".join(SEARCH_FIELDS)
+    values = ", ".join(f"COALESCE({field}, '')" for field in SEARCH_FIELDS)
+    query = f"INSERT INTO {SEARCH_TABLE} ({columns}, fingerprint) SELECT {values}, fingerprint FROM {TABLE_NAME} "
+    if fingerprints is None:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(query + "WHERE fingerprint != ''")
+        return
+    for fingerprint in fingerprints:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE fingerprint = ?", (fingerprint,))
+        cursor.execute(query + "WHERE fingerprint = ?", (fingerprint,))
+
+
+def _match_expression(query: str) -> str:
+    """
+    Turns what the user typed into a safe FTS5 query: every word must appear (in any of the
+    indexed fields) and the last one is matched as a prefix, so results update while typing.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return ""
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return " ".join(terms)
 
 
-def paper_exists(path: str) -> bool:
+def search_papers(query: str, limit: int = 20, offset: int = 0, conn: sqlite3.Connection = None) -> list:
     """
-    Checks if a paper with the given path already exists in the database.
+    Full-text search over the fields in SEARCH_FIELDS, best BM25 match first.
+
+    Returns dicts with the paper's path, its stored paper_id and display_title, year, score and a
+    snippet of the best matching field with the hits wrapped in ** (Markdown bold). Pass `conn` to search through another
+    connection, e.g. the dashboard's read-only one.
+    """
+    expression = _match_expression(query)
+    if not expression:
+        return []
+
+    weights = ", ".join(str(weight) for weight in SEARCH_FIELDS.values())
+    sql = f"""SELECT s.path, s.paper_id, s.display_title, s.year,
+                     bm25({SEARCH_TABLE}, {weights}) AS score,
+                     snippet({SEARCH_TABLE}, -1, '**', '**', ' … ', 24) AS snippet
+              FROM {SEARCH_TABLE}
+              JOIN {TABLE_NAME} s ON s.fingerprint = {SEARCH_TABLE}.fingerprint
+              WHERE {SEARCH_TABLE} MATCH ?
+              ORDER BY score
+              LIMIT ? OFFSET ?"""
+    columns = ("path", "paper_id", "display_title", "year", "score", "snippet")
+
+    if conn is not None:
+        rows = conn.execute(sql, (expression, limit, offset)).fetchall()
+    else:
+        with connection() as shared:
+            rows = shared.execute(sql, (expression, limit, offset)).fetchall()
+    return [dict(zip(columns, row)) for row in rows]
+
+
+# --- Normalised child tables ---
+
+_NUMBER = re.compile(r'[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?')
+_NAME_VALUE = re.compile(r'^\s*([^:=]+?)\s*[:=]\s*(.+?)\s*$')
+_NAME_NUMBER = re.compile(r'^\s*(.*?\S)\s+(?:of\s+)?([-+]?\.?\d.*?)\s*$', re.IGNORECASE)   # "MAPE of 4.2%"
+
+
+def _as_list(value) -> list:
+    """A list field as stored in the state (list) or in the survey table (JSON string)."""
+    if value is None or value == "":
+        return []
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except json.JSONDecodeError:
+            return [value]
+    return value if isinstance(value, list) else [value]
+
+
+def parse_metric(item) -> tuple:
+    """
+    Splits one entry of the `metrics` field into (name, value, number, model).
+    Entries are either {"name": ..., "value": ..., ["model": ...]} dicts or strings such as
+    "MAPE: 4.2%" or "MAPE of 4.2%"; `number` is the first number in the value (None if there is none).
+    """
+    model = None
+    if isinstance(item, dict):
+        name, value, model = item.get('name'), item.get('value'), item.get('model')
+        if name is None and len(item) == 1:
+            name, value = next(iter(item.items()))
+    else:
+        match = _NAME_VALUE.match(str(item)) or _NAME_NUMBER.match(str(item))
+        name, value = (match.group(1), match.group(2)) if match else (str(item), None)
+
+    value = None if value is None else str(value)
+    number = _NUMBER.search(value) if value else None
+    return (str(name).strip() if name is not None else None, value,
+            float(number.group(0)) if number else None, str(model) if model is not None else None)
+
+
+def _write_child_rows(cursor, fingerprint: str, data: dict):
+    """Replaces the child rows of one paper with the items of its list fields."""
+    if not fingerprint:
+        return
+    for table, (field, column) in CHILD_TABLES.items():
+        cursor.execute(f"DELETE FROM {table} WHERE fingerprint = ?", (fingerprint,))
+        rows = [(fingerprint, position, str(item).strip())
+                for position, item in enumerate(_as_list(data.get(field))) if str(item).strip()]
+        cursor.executemany(f"INSERT INTO {table} (fingerprint, position, {column}) VALUES (?, ?, ?)", rows)
+
+    cursor.execute(f"DELETE FROM {METRIC_TABLE} WHERE fingerprint = ?", (fingerprint,))
+    rows = [(fingerprint, position) + parse_metric(item)
+            for position, item in enumerate(_as_list(data.get('metrics')))]
+    cursor.executemany(f"INSERT INTO {METRIC_TABLE} (fingerprint, position, name, value, value_num, model) "
+                       f"VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+
+def _rebuild_child_tables(cursor):
+    fields = [field for field, _ in CHILD_TABLES.values()] + ['metrics']
+    rows = cursor.execute(f"SELECT fingerprint, {', '.join(fields)} FROM {TABLE_NAME} "
+                          f"WHERE fingerprint IS NOT NULL AND fingerprint != ''").fetchall()
+    for row in rows:
+        _write_child_rows(cursor, row[0], dict(zip(fields, row[1:])))
+
+
+def find_papers(method: str = None, metric: str = None, max_value: float = None,
+                min_value: float = None, limit: int = 100) -> list:
+    """
+    Example cross-paper query over the child tables, e.g. every paper evaluating an LSTM
+    with a MAPE below 5:
+
+        find_papers(method="LSTM", metric="MAPE", max_value=5)
+
+    Names are matched exactly but case-insensitively, which keeps the lookups on the indexes.
+    Returns (path, title, metric name, value) rows, best (lowest) value first.
+    """
+    joins, conditions, params = [], [], []
+    if method is not None:
+        joins.append("JOIN paper_method m ON m.fingerprint = s.fingerprint")
+        conditions.append("m.method = ? COLLATE NOCASE")
+        params.append(method)
+    if metric is not None:
+        joins.append(f"JOIN {METRIC_TABLE} k ON k.fingerprint = s.fingerprint")
+        conditions.append("k.name = ? COLLATE NOCASE")
+        params.append(metric)
+        if max_value is not None:
+            conditions.append("k.value_num <= ?")
+            params.append(max_value)
+        if min_value is not None:
+            conditions.append("k.value_num >= ?")
+            params.append(min_value)
+
+    metric_columns = "k.name, k.value" if metric is not None else "NULL, NULL"
+    order = "ORDER BY k.value_num" if metric is not None else "ORDER BY s.title"
+    query = (f"SELECT DISTINCT s.path, s.title, {metric_columns} FROM {TABLE_NAME} s "
+             f"{' '.join(joins)} {'WHERE ' + ' AND '.join(conditions) if conditions else ''} "
+             f"{order} LIMIT ?")
+
+    with connection() as conn:
+        return conn.execute(query, params + [limit]).fetchall()
+
+
+def upsert_paper(data: State) -> bool:
+    """
+    Inserts a new paper record or replaces an existing one. A thin wrapper over `save_results`,
+    which writes it as a relevant result in one transaction; returns whether it was committed.
+    """
+    return save_results([(data['path'], data, True)])
+
+
+def sync_manifest(fingerprints: dict):
+    """
+    Records where each known PDF currently lives, keyed by its content hash.
+
+    Rows written before fingerprints existed are matched by path and back-filled first.
+    Papers that were renamed or moved then get their stored path updated, so renaming
+    files (e.g. with `rename_files.py`) never makes a paper look new.
 
     Args:
-        path (str): The file path of the paper, which is the primary key.
+        fingerprints (dict): Maps each current file path to its SHA-256 fingerprint.
+    """
+    try:
+        with transaction() as conn:
+            _sync_manifest(conn.cursor(), fingerprints)
+    except sqlite3.Error as e:
+        print(f"--- DATABASE ERROR: Failed to sync the manifest. Error: {e} ---")
+
+
+def _sync_manifest(cursor, fingerprints: dict):
+    known = {row[0] for row in cursor.execute(f"SELECT fingerprint FROM {TABLE_NAME} WHERE fingerprint != ''")}
+    fingerprinted = []
+    for path, fingerprint in fingerprints.items():
+        if fingerprint not in known:
+            cursor.execute(f"UPDATE {TABLE_NAME} SET fingerprint = ? "
+                           f"WHERE path = ? AND (fingerprint IS NULL OR fingerprint = '')", (fingerprint, path))
+            if cursor.rowcount:
+                fingerprinted.append(fingerprint)
+    # The search index is keyed on the fingerprint, so rows that just got one become searchable.
+    _rebuild_search_index(cursor, fingerprinted)
+
+    # Paths are the primary key and renumbering can swap them between papers, so any row
+    # sitting on a path that now holds a different PDF is parked on a unique temporary path
+    # first. Rows whose PDF is no longer in the folder keep that parked path.
+    for path, fingerprint in fingerprints.items():
+        row = cursor.execute(f"SELECT rowid, fingerprint FROM {TABLE_NAME} WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[1] != fingerprint:
+            cursor.execute(f"UPDATE {TABLE_NAME} SET path = ? WHERE rowid = ?",
+                           (f"{PARKED_PREFIX}{row[1] or row[0]}", row[0]))
+    moved = []
+    for path, fingerprint in fingerprints.items():
+        cursor.execute(f"UPDATE {TABLE_NAME} SET path = ? WHERE fingerprint = ? AND path != ?",
+                       (path, fingerprint, path))
+        if cursor.rowcount:
+            moved.append(fingerprint)
+    # The paper ID shown in the dashboard comes from the file name; parked rows have none, so
+    # they no longer show up under the ID of the file that took their place.
+    parked = [row[0] for row in cursor.execute(f"SELECT path FROM {TABLE_NAME} WHERE path LIKE ? AND paper_id IS NOT NULL",
+                                               (f"{PARKED_PREFIX}%",))]
+    _refresh_display_columns(cursor, moved, parked)
+
+    for path, fingerprint in fingerprints.items():
+        cursor.execute(f"""INSERT INTO {MANIFEST_TABLE} (fingerprint, path) VALUES (?, ?)
+                           ON CONFLICT(fingerprint) DO UPDATE SET path = excluded.path,
+                                                                 updated_at = CURRENT_TIMESTAMP""",
+                       (fingerprint, path))
+    # PDFs that are no longer in the folder: their last path may now hold another file.
+    current = set(fingerprints.values())
+    departed = [row[0] for row in cursor.execute(f"SELECT fingerprint FROM {MANIFEST_TABLE} WHERE path IS NOT NULL")
+                if row[0] not in current]
+    cursor.executemany(f"UPDATE {MANIFEST_TABLE} SET path = NULL, updated_at = CURRENT_TIMESTAMP WHERE fingerprint = ?",
+                       [(fingerprint,) for fingerprint in departed])
+
+
+def _mark_processed(cursor, fingerprint: str, path: str, relevancy: bool):
+    cursor.execute(f"""INSERT INTO {MANIFEST_TABLE} (fingerprint, path, relevancy) VALUES (?, ?, ?)
+                       ON CONFLICT(fingerprint) DO UPDATE SET path = excluded.path,
+                                                             relevancy = excluded.relevancy,
+                                                             updated_at = CURRENT_TIMESTAMP""",
+                   (fingerprint, path, int(bool(relevancy))))
+
+
+def _optional_int(value):
+    return None if value is None else int(bool(value))
+
+
+def _record_relevancy(cursor, state: State, relevant: bool):
+    info = state.get('relevancy_info') or {}
+    cursor.execute(f"""INSERT OR REPLACE INTO {RELEVANCY_TABLE}
+                       (fingerprint, run_id, abstract, relevancy, decided_by, lexical_score, lexical_lean,
+                        prefilter_verdict, flash_verdict)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                   (state['fingerprint'], info.get('run_id'), info.get('abstract') or state.get('abstract'), int(bool(relevant)),
+                    info.get('decided_by'), info.get('score'), _optional_int(info.get('lean')),
+                    _optional_int(info.get('prefilter')), _optional_int(info.get('flash'))))
+
+
+def save_results(results: list):
+    """
+    Writes a batch of finished papers in a single transaction: the relevant ones are upserted,
+    every one of them is marked as processed in the manifest and its relevancy verdict is logged.
+
+    Args:
+        results (list): (path, final_state, relevant) tuples.
 
     Returns:
-        bool: True if the paper exists, False otherwise.
+        bool: Whether the batch was committed. On a database error nothing is written, and the
+        papers' checkpoints must be kept so the next run can save them.
+    """
+    if not results:
+        return True
+    try:
+        with transaction() as conn:
+            cursor = conn.cursor()
+            for path, final_state, relevant in results:
+                if relevant:
+                    _upsert(cursor, final_state)
+                _mark_processed(cursor, final_state['fingerprint'], path, relevant)
+                _record_relevancy(cursor, final_state, relevant)
+        return True
+    except sqlite3.Error as e:
+        paths = ", ".join(path for path, _, _ in results)
+        print(f"--- DATABASE ERROR: Failed to save results for {paths}. Error: {e} ---")
+        return False
+
+
+def processed_fingerprints() -> set:
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    Returns the content hashes of every paper already processed (saved, or recorded as not
+    relevant), with one query, so the caller can filter its whole file list up front.
+    """
+    query = f"""SELECT fingerprint FROM {TABLE_NAME} WHERE fingerprint IS NOT NULL AND fingerprint != ''
+                UNION
+                SELECT fingerprint FROM {MANIFEST_TABLE} WHERE relevancy IS NOT NULL"""
+
+    with connection() as conn:
+        return {row[0] for row in conn.execute(query)}
+
+
+def insert_run_metrics(rows: list):
+    """Appends a batch of LLM call metric rows (see src/metrics.py) in one transaction."""
+    try:
+        with transaction() as conn:
+            conn.executemany(f"INSERT INTO {METRICS_TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+    except sqlite3.Error as e:
+        print(f"--- DATABASE ERROR: Failed to write {len(rows)} metric rows. Error: {e} ---")
 
-    # A more efficient query than SELECT *; we just need to know if a row exists.
-    # The `LIMIT 1` ensures the database stops searching as soon as it finds a match.
-    query = f"SELECT 1 FROM {TABLE_NAME} WHERE path = ? LIMIT 1"
 
-    cursor.execute(query, (path,))
-    result = cursor.fetchone()
+def fetch_run_metrics(run_id: str = None) -> list:
+    """Returns (node, fingerprint, input_tokens, output_tokens, latency, retries, cached, cost) rows."""
+    query = (f"SELECT node, fingerprint, input_tokens, output_tokens, latency, retries, cached, cost "
+             f"FROM {METRICS_TABLE}")
+    with connection() as conn:
+        if run_id is None:
+            return conn.execute(query).fetchall()
+        return conn.execute(query + " WHERE run_id = ?", (run_id,)).fetchall()
 
-    conn.close()
 
-    # fetchone() returns a tuple (e.g., (1,)) if a record is found, otherwise None.
-    # So, checking if the result is not None gives us our boolean.
-    return result is not None
+def fetch_relevancy_labels(sources: tuple) -> list:
+    """
+    Returns (abstract, relevancy) training pairs: the verdicts made by the given tiers of the
+    relevancy cascade, plus the abstracts of saved papers from before verdicts were logged.
+    """
+    placeholders = ", ".join("?" * len(sources))
+    query = f"""SELECT abstract, relevancy FROM {RELEVANCY_TABLE}
+                WHERE decided_by IN ({placeholders}) AND abstract IS NOT NULL AND abstract != ''
+                UNION ALL
+                SELECT abstract, 1 FROM {TABLE_NAME} s
+                WHERE abstract IS NOT NULL AND abstract != ''
+                  AND NOT EXISTS (SELECT 1 FROM {RELEVANCY_TABLE} r WHERE r.fingerprint = s.fingerprint)"""
+    with connection() as conn:
+        return conn.execute(query, tuple(sources)).fetchall()
+
+
+def fetch_relevancy_decisions(run_id: str = None) -> list:
+    """Returns (relevancy, decided_by, lexical_lean, prefilter_verdict, flash_verdict) rows for one run (or all)."""
+    query = f"SELECT relevancy, decided_by, lexical_lean, prefilter_verdict, flash_verdict FROM {RELEVANCY_TABLE}"
+    with connection() as conn:
+        if run_id is None:
+            return conn.execute(query).fetchall()
+        return conn.execute(query + " WHERE run_id = ?", (run_id,)).fetchall()
+
+
+def latest_run_id():
+    with connection() as conn:
+        row = conn.execute(f"SELECT run_id FROM {METRICS_TABLE} ORDER BY created_at DESC LIMIT 1").fetchone()
+    return row[0] if row else None
+
+
+if __name__ == "__main__":
+    # python -m src.database backfill   -> fill the derived columns/tables of existing rows
+    if sys.argv[1:] == ["backfill"]:
+        create_database()
+        backfill()
+    else:
+        print("Usage: python -m src.database backfill")
@@ -0,0 +1,97 @@
+import json
+import math
+import re
+
+# Display formatting for the dashboard. The pipeline applies these once, when a paper is written
+# (see `display_columns` and database.DISPLAY_COLUMNS), so the pages can show stored strings as-is.
+
+_NUMERIC_FILE_NAME = re.compile(r'^(\d+)\.pdf$', re.IGNORECASE)
+
+
+def paper_id_from_path(path: str):
+    """The numeric ID of a paper renamed by `rename_files.py` ("papers/12.pdf" -> 12), else None."""
+    if not path:
+        return None
+    match = _NUMERIC_FILE_NAME.match(re.split(r'[\\/]', path)[-1])
+    return int(match.group(1)) if match else None
+
+
+def display_columns(row: dict) -> dict:
+    """
+    The ready-to-render values stored next to a paper's raw fields. `row` holds the fields as
+    stored in the database (list fields as JSON strings).
+    """
+    paper_id = paper_id_from_path(row.get('path'))
+    title = row.get('title') or 'Untitled'
+    return {"paper_id": paper_id,
+            "display_title": f"{paper_id} : {title}" if paper_id is not None else title,
+            "authors_display": format_simple_list(row.get('authors')),
+            "methods_display": format_simple_list(row.get('experimental_methods')),
+            "features_display": format_simple_list(row.get('features_used')),
+            "preprocessing_display": format_simple_list(row.get('data_preprocessing')),
+            "metrics_display": format_metrics(row.get('metrics'))}
+
+
+def safe_json_loads(s):
+    """Safely loads a JSON string, returning an empty list if it fails."""
+    if not s or (isinstance(s, float) and math.isnan(s)):
+        return []
+    try:
+        try:
+            data = json.loads(s)
+        except json.JSONDecodeError:
+            # Handle cases where the string might be a Python repr of a list of strings
+            data = json.loads(s.replace("'", "\""))
+        # Ensure the output is a list for consistency
+        return data if isinstance(data, list) else [data]
+    except (json.JSONDecodeError, TypeError):
+        # If it's just a plain string, return it in a list
+        return [s] if s else []
+
+
+def format_metrics(metrics_json_string: str) -> str:
+    """
+    Intelligently formats the 'metrics' data for display.
+    This version is robust and handles lists containing a mix of strings and dictionaries.
+    """
+    data = safe_json_loads(metrics_json_string)
+
+    if not data or not isinstance(data, list):
+        return ""  # Return empty if there's no data or it's not a list
+
+    # --- NEW ROBUST LOGIC ---
+    # Create a new list to hold the properly formatted string for each item.
+    formatted_parts = []
+
+    # Iterate through each item in the list individually.
+    for item in data:
+        if isinstance(item, str):
+            # If it's a string, add it directly.
+            formatted_parts.append(item)
+        elif isinstance(item, dict):
+            # If it's a dictionary, format it into "name: value".
+            if 'name' in item and 'value' in item:
+                formatted_parts.append(f"{item['name']}: {item['value']}")
+            else:
+                # Fallback for unexpected dictionary structures.
+                formatted_parts.append(str(item))
+        else:
+            # Fallback for any other unexpected data type.
+            formatted_parts.append(str(item))
+
+    # Join the final list of formatted strings. Using a semicolon is good for readability.
+    return "; ".join(formatted_parts)
+
+
+def format_simple_list(json_string: str) -> str:
+    """
+    Formats a JSON string representing a simple list of items
+    into a human-readable, comma-separated string.
+    """
+    data = safe_json_loads(json_string)
+
+    if not data or not isinstance(data, list):
+        return ""
+
+    # Ensure all items are strings before joining
+    return ", ".join(map(str, data))
\ No newline at end of file
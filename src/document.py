@@ -0,0 +1,96 @@
+import threading
+from contextlib import contextmanager
+import pymupdf
+from src import utils
+
+# PyMuPDF is not safe to drive from several threads at once, even on different documents.
+# Every call into it from the ingestion nodes goes through this lock.
+mupdf_lock = threading.RLock()
+
+
+class DocumentSession:
+    """
+    Holds one parsed PDF for the duration of a paper's graph run.
+
+    The file is opened once; its metadata and per-page text are read on first use and
+    then shared by every ingestion node, instead of each node re-opening and re-parsing it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with mupdf_lock:
+            self.doc = pymupdf.open(path)
+            self.metadata = dict(self.doc.metadata or {})
+            self.page_count = self.doc.page_count
+        self._page_texts = {}
+        self._page_sizes = {}
+        self._page_images = {}
+
+    def page_text(self, index: int) -> str:
+        if index not in self._page_texts:
+            with mupdf_lock:
+                self._page_texts[index] = self.doc.load_page(index).get_text()
+        return self._page_texts[index]
+
+    def page_size(self, index: int) -> tuple:
+        """(width, height) of the page in points."""
+        if index not in self._page_sizes:
+            with mupdf_lock:
+                rect = self.doc.load_page(index).rect
+                self._page_sizes[index] = (rect.width, rect.height)
+        return self._page_sizes[index]
+
+    def has_images(self, index: int) -> bool:
+        """Whether the page carries any images, i.e. could be a scan."""
+        if index not in self._page_images:
+            with mupdf_lock:
+                self._page_images[index] = bool(self.doc.load_page(index).get_images())
+        return self._page_images[index]
+
+    def render_page(self, index: int, dpi: int):
+        """The page as a Pillow image for OCR; MuPDF is locked only while it renders."""
+        with mupdf_lock:
+            return utils.render_page_image(self.doc.load_page(index), dpi)
+
+    def iter_page_texts(self):
+        """Yields page texts one at a time, extracting each page only when it is reached."""
+        for i in range(self.page_count):
+            yield self.page_text(i)
+
+    def close(self):
+        with mupdf_lock:
+            if not self.doc.is_closed:
+                self.doc.close()
+
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(path: str) -> DocumentSession:
+    """Returns the open session for `path`, opening (and registering) it on first use."""
+    with _sessions_lock:
+        session = _sessions.get(path)
+        if session is None:
+            session = DocumentSession(path)
+            _sessions[path] = session
+        return session
+
+
+def close_session(path: str):
+    with _sessions_lock:
+        session = _sessions.pop(path, None)
+    if session is not None:
+        session.close()
+
+
+@contextmanager
+def paper_session(path: str):
+    """
+    Scopes a document session to one graph run. Nodes call `get_session(state['path'])`;
+    the file is closed here when the run ends, whether it succeeded or not.
+    """
+    try:
+        yield
+    finally:
+        close_session(path)
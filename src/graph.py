@@ -1,6 +1,7 @@
 from langgraph.graph import StateGraph, END, START
 from src.initialise_state import State
-from src import nodes
+from src import nodes, ingestion, tracing, checkpoint
+import definitions
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -9,7 +10,7 @@ def route_for_metadata_quality(state: State) -> str:
     landmarks = state.get('landmarks', {})
     if state.get('ocr_needed') is True:
         return "extract_metadata" # Already tried OCR, give up and extract what we can
-    if landmarks.get('abstract_start', -1) == -1 and landmarks.get('introduction_start', -1) == -1:
+    if ingestion.landmarks_missing(landmarks):
         return "perform_ocr"
     return "extract_metadata"
 
@@ -25,41 +26,89 @@ def route_by_relevancy(state: State) -> str:
         return "not_relevant"
 
 
-def create_graph():
-    """Builds and compiles the complete LangGraph pipeline."""
+def _add_node(builder: StateGraph, name: str, fn):
+    """Registers a node, wrapped for tracing when `definitions.TRACING` is on."""
+    builder.add_node(name, tracing.traced(name, fn))
+
+
+def create_graph(use_async: bool = False, extraction_mode: str = None, relevancy_first: bool = None):
+    """
+    Builds and compiles the complete LangGraph pipeline.
+
+    Args:
+        use_async (bool): Register the native async versions of the four parallel extraction
+            nodes. Use with `graph.ainvoke` (the concurrent runner); the sync versions are kept
+            for small, one-paper-at-a-time runs with `graph.invoke`.
+        extraction_mode (str): "fanout" runs four parallel extraction calls per relevant paper
+            (lowest latency); "combined" makes one call for all fields over a shared context
+            (fewest input tokens). Defaults to `definitions.EXTRACTION_MODE`.
+        relevancy_first (bool): Decide relevancy from the first pages and their sliced abstract,
+            then read the full text (with OCR) and run the metadata call only on the relevant
+            branch, so an irrelevant paper costs a short read and one relevancy call. False
+            keeps the original order. Defaults to `definitions.RELEVANCY_FIRST`.
+    """
+    if extraction_mode is None:
+        extraction_mode = definitions.EXTRACTION_MODE
+    if relevancy_first is None:
+        relevancy_first = definitions.RELEVANCY_FIRST
+    if extraction_mode not in ("fanout", "combined"):
+        raise ValueError(f"Unknown extraction mode: {extraction_mode}")
+
     builder = StateGraph(State)
 
     # --- Add all nodes from nodes.py ---
-    builder.add_node("direct_metadata_extract", nodes.extract_from_pdf_metadata)
-    builder.add_node("read_and_locate_landmarks", nodes.read_and_locate_landmarks)
-    builder.add_node("perform_ocr", nodes.ocr_and_relocate_landmarks)
-    builder.add_node("extract_metadata", nodes.extract_sliced_metadata)
+    _add_node(builder, "direct_metadata_extract", nodes.extract_from_pdf_metadata)
+    if relevancy_first:
+        _add_node(builder, "read_first_pages", nodes.read_first_pages)
+    _add_node(builder, "read_and_locate_landmarks",
+              nodes.aread_and_locate_landmarks if use_async else nodes.read_and_locate_landmarks)
+    _add_node(builder, "perform_ocr", nodes.ocr_and_relocate_landmarks)
+    _add_node(builder, "extract_metadata", nodes.extract_sliced_metadata)
 
     # --- Use the new relevancy node ---
-    builder.add_node("check_relevancy", nodes.check_paper_relevancy)
+    _add_node(builder, "check_relevancy", nodes.check_paper_relevancy)
 
     # The relevant/not_relevant nodes are just for setting the final state flag
-    builder.add_node("not_relevant", nodes.not_relevant_node)
-    builder.add_node("relevant", nodes.relevant_node)
+    _add_node(builder, "not_relevant", nodes.not_relevant_node)
+    _add_node(builder, "relevant", nodes.relevant_node)
 
     # Analysis nodes
-    builder.add_node("extract_methodology", nodes.extract_methodology_and_models)
-    builder.add_node("extract_analysis", nodes.extract_analysis_and_findings)
-    builder.add_node("extract_dataset", nodes.extract_dataset_properties)
-    builder.add_node("extract_experiments", nodes.extract_experimental_setup)
-    builder.add_node("join_branches", nodes.dummy_node)
+    if extraction_mode == "combined":
+        _add_node(builder, "extract_all", nodes.aextract_all_fields if use_async else nodes.extract_all_fields)
+    elif use_async:
+        _add_node(builder, "extract_methodology", nodes.aextract_methodology_and_models)
+        _add_node(builder, "extract_analysis", nodes.aextract_analysis_and_findings)
+        _add_node(builder, "extract_dataset", nodes.aextract_dataset_properties)
+        _add_node(builder, "extract_experiments", nodes.aextract_experimental_setup)
+    else:
+        _add_node(builder, "extract_methodology", nodes.extract_methodology_and_models)
+        _add_node(builder, "extract_analysis", nodes.extract_analysis_and_findings)
+        _add_node(builder, "extract_dataset", nodes.extract_dataset_properties)
+        _add_node(builder, "extract_experiments", nodes.extract_experimental_setup)
+    if extraction_mode == "fanout":
+        _add_node(builder, "join_branches", nodes.dummy_node)
 
     # --- Define the graph's edges ---
     builder.add_edge(START, "direct_metadata_extract")
-    builder.add_edge("direct_metadata_extract", "read_and_locate_landmarks")
+    if relevancy_first:
+        # Only the first pages are read before the relevancy check; the full ingestion
+        # below runs after the "relevant" node instead.
+        builder.add_edge("direct_metadata_extract", "read_first_pages")
+        builder.add_edge("read_first_pages", "check_relevancy")
+        builder.add_edge("relevant", "read_and_locate_landmarks")
+    else:
+        builder.add_edge("direct_metadata_extract", "read_and_locate_landmarks")
     builder.add_conditional_edges("read_and_locate_landmarks", route_for_metadata_quality, {
         "perform_ocr": "perform_ocr",
         "extract_metadata": "extract_metadata"
     })
     builder.add_edge("perform_ocr", "extract_metadata")
 
-    # After metadata, run the relevancy check
-    builder.add_edge("extract_metadata", "check_relevancy")
+    if not relevancy_first:
+        # After metadata, run the relevancy check
+        builder.add_edge("extract_metadata", "check_relevancy")
+    # The analysis starts from whichever node comes last before it
+    analysis_start = "extract_metadata" if relevancy_first else "relevant"
 
     # --- Use the new conditional router ---
     builder.add_conditional_edges(
@@ -74,11 +123,17 @@ def create_graph():
     # The "not_relevant" path now goes to its simple node and then ends
     builder.add_edge("not_relevant", END)
 
+    if extraction_mode == "combined":
+        # One call for every field group, then done
+        builder.add_edge(analysis_start, "extract_all")
+        builder.add_edge("extract_all", END)
+        return builder.compile(checkpointer=checkpoint.get_saver())
+
     # Parallel fork for relevant papers
-    builder.add_edge("relevant", "extract_methodology")
-    builder.add_edge("relevant", "extract_analysis")
-    builder.add_edge("relevant", "extract_dataset")
-    builder.add_edge("relevant", "extract_experiments")
+    builder.add_edge(analysis_start, "extract_methodology")
+    builder.add_edge(analysis_start, "extract_analysis")
+    builder.add_edge(analysis_start, "extract_dataset")
+    builder.add_edge(analysis_start, "extract_experiments")
 
     # Join parallel branches
     builder.add_edge("extract_methodology", "join_branches")
@@ -89,4 +144,4 @@ def create_graph():
     builder.add_edge("join_branches", END)
 
     # builder.add_edge("extract_metadata", END)
-    return builder.compile()
\ No newline at end of file
+    return builder.compile(checkpointer=checkpoint.get_saver())
\ No newline at end of file
@@ -0,0 +1,189 @@
+import hashlib
+import itertools
+from src import utils, document, ocr, sections, tracing
+from src.text_cache import text_cache
+import definitions
+
+# The CPU-bound half of the pipeline: PDF parsing, OCR and section/landmark location.
+# Nothing in here talks to the LLM, so it can run in worker processes (see `prefetch_paper`)
+# as well as inside the graph's ingestion nodes.
+
+# The runner's process pool while a run is in progress (see `runner.run_papers`), else None.
+# The relevancy-first graph reads the full text of its relevant papers there, with `prefetch_paper`,
+# instead of in a graph thread behind the MuPDF lock.
+prefetch_pool = None
+
+
+def landmarks_missing(landmarks: dict) -> bool:
+    """True when neither the abstract nor the introduction was found, i.e. OCR is worth a try."""
+    return landmarks.get('abstract_start', -1) == -1 and landmarks.get('introduction_start', -1) == -1
+
+
+def read_metadata(path: str, fingerprint: str) -> dict:
+    """Returns the PDF's internal metadata dictionary."""
+    metadata = text_cache.get(fingerprint, 'metadata')
+    if metadata is None:
+        metadata = document.get_session(path).metadata
+        text_cache.put(fingerprint, 'metadata', metadata)
+    return metadata
+
+
+def _stop_tag() -> str:
+    """Short hash of `TEXT_STOP_HEADINGS`. Text cut at them is cached under it, so changing the headings re-cuts."""
+    return hashlib.sha256("\n".join(definitions.TEXT_STOP_HEADINGS).encode("utf-8")).hexdigest()[:12]
+
+
+def _ocr_batch(path: str, fingerprint: str, indices: list, scanned: list, parallel: bool) -> list:
+    scanned.extend(indices)
+    with tracing.span("ocr", fingerprint[:12], pages=len(indices)):
+        texts = ocr.ocr_pages(path, fingerprint, indices, parallel=parallel)
+    return [texts[str(index)] for index in indices]
+
+
+def _page_texts(path: str, fingerprint: str, scanned: list, parallel_ocr: bool, limit: int = None):
+    """
+    Yields the text of each page in order (the first `limit` pages only, if given), with scanned
+    pages replaced by their OCR text as they are reached. A stop heading on a scanned page is
+    therefore found too, and the pages after it are neither read nor OCR'd. Runs of consecutive
+    scanned pages are OCR'd together, up to OCR_WORKERS at a time when `parallel_ocr`, so at
+    most that many pages are OCR'd past the stop heading. Indices of scanned pages go to `scanned`.
+    """
+    session = document.get_session(path)
+    batch_size = definitions.OCR_WORKERS if parallel_ocr else 1
+    pending = []
+    for index, text in enumerate(itertools.islice(session.iter_page_texts(), limit)):
+        if ocr.needs_ocr(session, index, text):
+            pending.append(index)
+            if len(pending) >= batch_size:
+                yield from _ocr_batch(path, fingerprint, pending, scanned, parallel_ocr)
+                pending = []
+            continue
+        if pending:
+            yield from _ocr_batch(path, fingerprint, pending, scanned, parallel_ocr)
+            pending = []
+        yield text
+    if pending:
+        yield from _ocr_batch(path, fingerprint, pending, scanned, parallel_ocr)
+
+
+def _read_pages(path: str, fingerprint: str, parallel_ocr: bool, limit: int = None) -> tuple:
+    """Returns (page texts cut at the stop heading, indices of the scanned pages among them)."""
+    scanned = []
+    pages = list(utils.pages_until_stop(_page_texts(path, fingerprint, scanned, parallel_ocr, limit)))
+    return pages, [index for index in scanned if index < len(pages)]
+
+
+def read_text(path: str, fingerprint: str, parallel_ocr: bool = True) -> tuple:
+    """
+    Returns the paper's text, cut at the References section, together with the indices of the
+    pages that had no text layer and were OCR'd instead (before any landmark is looked for).
+    Only the pages before the stop heading are extracted, checked for scans and OCR'd; for
+    scanned pages the heading is looked for in the OCR output.
+    """
+    # Text already extracted from this exact file by an earlier run skips PyMuPDF entirely.
+    kind = f"text:{_stop_tag()}"
+    cached = text_cache.get(fingerprint, kind)
+    if cached is None:
+        pages, scanned_pages = _read_pages(path, fingerprint, parallel_ocr)
+        cached = {'pages': pages, 'scanned': scanned_pages}
+        text_cache.put(fingerprint, kind, cached)
+    return utils.join_page_texts(cached['pages']), cached['scanned']
+
+
+def index_text(fingerprint: str, raw_text: str) -> tuple:
+    """Returns (landmarks, section index) for the text, stored alongside it in the text cache."""
+    kind = f"sections:{_stop_tag()}"
+    cached = text_cache.get(fingerprint, kind) if raw_text else None
+    if cached is not None:
+        return cached['landmarks'], cached['sections']
+
+    with tracing.span("locate_landmarks", fingerprint[:12]):
+        section_index = sections.build_section_index(raw_text)
+        landmarks = sections.locate_landmarks(raw_text, section_index)
+    if raw_text:
+        text_cache.put(fingerprint, kind, {'landmarks': landmarks, 'sections': section_index})
+    return landmarks, section_index
+
+
+def read_head(path: str, fingerprint: str, parallel_ocr: bool = True) -> tuple:
+    """
+    Returns (text, landmarks) for the first `HEAD_PAGES` pages only: enough for the title block
+    and the abstract, so the relevancy-first graph can decide on a paper before reading the rest.
+    Scanned pages among them are OCR'd, and page one too if no landmark turns up otherwise.
+    """
+    # A paper read in full by an earlier run (e.g. with the other graph) costs nothing here.
+    cached = text_cache.get(fingerprint, f"text:{_stop_tag()}")
+    if cached is not None:
+        page_texts = cached['pages'][:definitions.HEAD_PAGES]
+        scanned_pages = [index for index in cached['scanned'] if index < len(page_texts)]
+    else:
+        page_texts, scanned_pages = _read_pages(path, fingerprint, parallel_ocr, definitions.HEAD_PAGES)
+
+    text = utils.join_page_texts(page_texts)
+    landmarks = sections.locate_landmarks(text)
+    if landmarks_missing(landmarks) and 0 not in scanned_pages:
+        ocr_text = ocr_first_page(path, fingerprint)
+        if ocr_text.strip():
+            text = ocr_text + "\n" + text
+            landmarks = sections.locate_landmarks(text)
+    return text, landmarks
+
+
+def ocr_first_page(path: str, fingerprint: str) -> str:
+    """Returns the OCR text of page one, from the cache when this file was OCR'd before."""
+    with tracing.span("ocr", fingerprint[:12], pages=1):
+        return ocr.ocr_pages(path, fingerprint, [0], parallel=False)['0']
+
+
+def prefetch_paper(path: str, fingerprint: str) -> dict:
+    """
+    Runs the whole ingestion half for one paper, in a worker process.
+
+    It follows the same route as the graph (scanned pages OCR'd up front, page-one OCR fallback
+    only if the landmarks are still missing) and returns the state fields the ingestion nodes would have produced, so the
+    graph can skip straight to the LLM stage. The text cache is filled as a side effect.
+    """
+    seeds = {}
+    with document.paper_session(path):
+        metadata = read_metadata(path, fingerprint)
+        if 'title' in metadata and metadata['title'] != 'untitled':
+            seeds['title'] = metadata['title']
+
+        # Already in a worker process, so any scanned pages are OCR'd here one after another.
+        raw_text, scanned_pages = read_text(path, fingerprint, parallel_ocr=False)
+        landmarks, section_index = index_text(fingerprint, raw_text)
+        if 0 in scanned_pages:
+            seeds['ocr_needed'] = True
+
+        if landmarks_missing(landmarks) and 0 not in scanned_pages:
+            ocr_text = ocr_first_page(path, fingerprint)
+            if ocr_text.strip():
+                raw_text = ocr_text + "\n" + raw_text
+            section_index = sections.build_section_index(raw_text)
+            landmarks = sections.locate_landmarks(raw_text, section_index)
+            seeds['ocr_needed'] = True
+
+    seeds['raw_text'] = raw_text
+    seeds['landmarks'] = landmarks
+    seeds['sections'] = section_index
+    return seeds
+
+
+def prefetch_head(path: str, fingerprint: str) -> dict:
+    """
+    The prefetch stage of the relevancy-first graph, in a worker process: only the PDF metadata,
+    the first pages and the abstract sliced from them. The full text is read inside the graph,
+    and only for the papers found relevant.
+    """
+    seeds = {}
+    with document.paper_session(path):
+        metadata = read_metadata(path, fingerprint)
+        if 'title' in metadata and metadata['title'] != 'untitled':
+            seeds['title'] = metadata['title']
+        head_text, landmarks = read_head(path, fingerprint, parallel_ocr=False)
+
+    seeds['head_text'] = head_text
+    abstract = sections.slice_abstract(head_text, landmarks)
+    if abstract:
+        seeds['abstract'] = abstract
+    return seeds
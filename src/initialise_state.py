@@ -21,10 +21,15 @@ def merge_update(current_value, new_value):
 class State(MessagesState):
     # --- Internal Fields for Graph Logic ---
     path:       Annotated[Union[str, None], merge_update]
+    fingerprint: Annotated[Union[str, None], merge_update]    # SHA-256 of the PDF bytes, the paper's identity
     raw_text:   Annotated[Union[str, None], merge_update]
+    head_text:  Annotated[Union[str, None], merge_update]    # First pages only, for the relevancy-first graph
     landmarks:  Annotated[Union[Dict, None], merge_update]
+    sections:   Annotated[Union[List[Dict], None], merge_update]    # Ordered heading index, see src/sections.py
+    raw_text_tokens: Annotated[Union[int, None], merge_update]    # Token count of raw_text, taken once before the extractors fork
     ocr_needed: Annotated[Union[bool, None], merge_update]
     relevancy:  Annotated[Union[bool, None], merge_update]
+    relevancy_info: Annotated[Union[Dict, None], merge_update]    # Which cascade tier decided, and what each tier said
 
     # --- Core Metadata ---
     title:                  Annotated[Union[str, None], merge_update]
@@ -75,11 +80,16 @@ def initialise_state() -> State:
     return {"messages": ['Paper Analysis'],
 
             "landmarks":            None,
+            "sections":             None,
+            "raw_text_tokens":      None,
             "raw_text":             None,
+            "head_text":            None,
             "ocr_needed":           None,
+            "relevancy_info":       None,
 
             # Core Metadata
             "path":                 None,
+            "fingerprint":          None,
             "title":                None,
             "authors":              None,
             "author_affiliations":  None,
@@ -0,0 +1,330 @@
+import asyncio
+import collections
+import random
+import threading
+import time
+from contextlib import contextmanager, asynccontextmanager
+import definitions
+from src import utils
+
+
+class RequestLimiter:
+    """
+    Caps the number of LLM requests in flight across the whole process.
+
+    Sync nodes run on LangGraph's worker threads while async nodes run on the event loop,
+    so a plain threading.Semaphore or asyncio.Semaphore would only bound one of them.
+    This limiter hands free slots to waiting threads and waiting coroutines alike.
+    """
+
+    def __init__(self, limit: int):
+        self._lock = threading.Lock()
+        self._limit = max(1, int(limit))
+        self._in_flight = 0
+        self._waiters = collections.deque()  # callables that wake a waiter and hand it the slot
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def set_limit(self, limit: int):
+        """
+        Changes the cap at run time. Raising it hands the new slots to waiters straight away;
+        lowering it takes effect as requests finish, since slots are only handed over while
+        `in_flight` is within the limit.
+        """
+        wake = []
+        with self._lock:
+            self._limit = max(1, int(limit))
+            while self._waiters and self._in_flight < self._limit:
+                self._in_flight += 1
+                wake.append(self._waiters.popleft())
+        for waiter in wake:
+            waiter()
+
+    def acquire(self):
+        with self._lock:
+            if self._in_flight < self._limit:
+                self._in_flight += 1
+                return
+            event = threading.Event()
+            self._waiters.append(event.set)
+        # The releasing side transfers its slot to us, so there is nothing to re-check here.
+        event.wait()
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._in_flight < self._limit:
+                self._in_flight += 1
+                return
+            future = loop.create_future()
+            self._waiters.append(lambda: loop.call_soon_threadsafe(self._hand_over, future))
+        await future
+
+    def _hand_over(self, future):
+        # A waiter cancelled while queued must not swallow the slot it was handed.
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    def release(self):
+        with self._lock:
+            if self._waiters and self._in_flight <= self._limit:
+                wake = self._waiters.popleft()
+            else:
+                self._in_flight -= 1
+                return
+        wake()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` units per minute up to one minute's worth. `reserve` takes the units
+    immediately, letting the level go negative, and returns how long the caller must wait before
+    using them; later callers queue behind that debt, so waits are granted in arrival order.
+    """
+
+    def __init__(self, per_minute: float):
+        self._lock = threading.Lock()
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self._level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float) -> float:
+        # A single request larger than the bucket could never be granted; it waits for a full bucket instead.
+        amount = min(amount, self.capacity)
+        with self._lock:
+            self._refill()
+            self._level -= amount
+            return max(0.0, -self._level / self.rate)
+
+    def adjust(self, amount: float):
+        """Corrects an earlier reservation once the real usage is known (negative gives units back)."""
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level - amount)
+
+
+def is_throttled(error: Exception) -> bool:
+    """Rate limit or quota errors (HTTP 429 / RESOURCE_EXHAUSTED), whichever client raised them."""
+    if getattr(error, 'code', None) == 429 or getattr(error, 'status_code', None) == 429:
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("429", "resourceexhausted", "resource_exhausted",
+                                             "resource exhausted", "rate limit", "too many requests"))
+
+
+def is_transient(error: Exception) -> bool:
+    """Errors worth retrying: throttling, timeouts and temporary server or connection failures."""
+    if is_throttled(error) or isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    text = f"{type(error).__name__} {error}".lower()
+    return any(marker in text for marker in ("timeout", "timed out", "deadlineexceeded", "deadline exceeded",
+                                             "serviceunavailable", "unavailable", "503", "500 internal",
+                                             "internalservererror", "connection reset"))
+
+
+class Governor:
+    """
+    The single gate every LLM request goes through. Each attempt first waits on the requests-per-
+    minute and tokens-per-minute buckets, then holds a slot of the shared `RequestLimiter`.
+    Transient failures are retried with exponential backoff and full jitter, outside the slot.
+    The limiter's cap is tuned AIMD-style: it is halved when the provider throttles us (at most
+    once per cool-down, since a burst of 429s reports the same congestion) and raised by one
+    after a full window of successful calls, never above `MAX_IN_FLIGHT_LLM_REQUESTS`.
+    """
+
+    def __init__(self, limiter: RequestLimiter):
+        self.limiter = limiter
+        self.requests = TokenBucket(definitions.LLM_REQUESTS_PER_MINUTE) if definitions.LLM_REQUESTS_PER_MINUTE else None
+        self.tokens = TokenBucket(definitions.LLM_TOKENS_PER_MINUTE) if definitions.LLM_TOKENS_PER_MINUTE else None
+        self._lock = threading.Lock()
+        self._successes = 0
+        self._last_decrease = 0.0
+        self.stats = {"calls": 0, "failures": 0, "retries": 0, "throttled": 0, "tokens": 0,
+                      "wait": 0.0, "first": None, "last": None, "min_limit": limiter.limit}
+
+    # --- Admission ---
+
+    def _reserve(self, estimate: int) -> float:
+        delay = 0.0
+        if self.requests is not None:
+            delay = max(delay, self.requests.reserve(1))
+        if self.tokens is not None:
+            delay = max(delay, self.tokens.reserve(estimate))
+        return delay
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(definitions.LLM_BACKOFF_MAX_S, definitions.LLM_BACKOFF_BASE_S * 2 ** attempt)
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    def _estimate(prompt: str) -> int:
+        return utils.count_tokens(prompt) + definitions.LLM_EXPECTED_OUTPUT_TOKENS
+
+    # --- Feedback ---
+
+    def _on_success(self, estimate: int, response):
+        usage = getattr(response, 'usage_metadata', None) or {}
+        used = usage.get('total_tokens') or estimate
+        if self.tokens is not None:
+            self.tokens.adjust(used - estimate)
+
+        raise_to = None
+        with self._lock:
+            now = time.monotonic()
+            self.stats["calls"] += 1
+            self.stats["tokens"] += used
+            self.stats["last"] = now
+            self._successes += 1
+            limit = self.limiter.limit
+            if self._successes >= limit and limit < definitions.MAX_IN_FLIGHT_LLM_REQUESTS:
+                self._successes = 0
+                raise_to = limit + 1
+        if raise_to is not None:
+            self.limiter.set_limit(raise_to)
+
+    def _on_failure(self, estimate: int, error: Exception, final: bool):
+        # A rejected attempt used none of the provider's tokens; give its reservation back so a
+        # burst of 429s does not drain the bucket for the calls that follow. (It still counted
+        # as a request.)
+        if self.tokens is not None:
+            self.tokens.adjust(-estimate)
+
+        lower_to = None
+        with self._lock:
+            if final:
+                self.stats["failures"] += 1
+            else:
+                self.stats["retries"] += 1
+            if is_throttled(error):
+                self.stats["throttled"] += 1
+                now = time.monotonic()
+                if now - self._last_decrease >= definitions.LLM_AIMD_COOLDOWN_S:
+                    self._last_decrease = now
+                    self._successes = 0
+                    lower_to = max(definitions.LLM_MIN_IN_FLIGHT, int(self.limiter.limit * definitions.LLM_AIMD_DECREASE))
+                    self.stats["min_limit"] = min(self.stats["min_limit"], lower_to)
+        if lower_to is not None and lower_to < self.limiter.limit:
+            print(f"--- LLM throttled; lowering concurrent requests to {lower_to}. ---")
+            self.limiter.set_limit(lower_to)
+
+    def _start(self):
+        with self._lock:
+            if self.stats["first"] is None:
+                self.stats["first"] = time.monotonic()
+
+    def _record_wait(self, seconds: float):
+        with self._lock:
+            self.stats["wait"] += seconds
+
+    # --- Calls ---
+
+    def call(self, fn, prompt: str):
+        """Runs `fn(prompt)` under the governor. Returns (response, latency of the successful attempt, retries)."""
+        self._start()
+        estimate = self._estimate(prompt)
+        for attempt in range(definitions.LLM_MAX_RETRIES + 1):
+            delay = self._reserve(estimate)
+            if delay:
+                self._record_wait(delay)
+                time.sleep(delay)
+            try:
+                with self.limiter.slot():
+                    start = time.perf_counter()
+                    response = fn(prompt)
+                    latency = time.perf_counter() - start
+            except Exception as e:
+                final = attempt == definitions.LLM_MAX_RETRIES or not is_transient(e)
+                self._on_failure(estimate, e, final)
+                if final:
+                    raise
+                pause = self._backoff(attempt)
+                self._record_wait(pause)
+                time.sleep(pause)
+                continue
+            self._on_success(estimate, response)
+            return response, latency, attempt
+
+    async def acall(self, fn, prompt: str):
+        """Async version of `call`; `fn` is a coroutine function such as `gemini.ainvoke`."""
+        self._start()
+        estimate = self._estimate(prompt)
+        for attempt in range(definitions.LLM_MAX_RETRIES + 1):
+            delay = self._reserve(estimate)
+            if delay:
+                self._record_wait(delay)
+                await asyncio.sleep(delay)
+            try:
+                async with self.limiter.aslot():
+                    start = time.perf_counter()
+                    response = await fn(prompt)
+                    latency = time.perf_counter() - start
+            except Exception as e:
+                final = attempt == definitions.LLM_MAX_RETRIES or not is_transient(e)
+                self._on_failure(estimate, e, final)
+                if final:
+                    raise
+                pause = self._backoff(attempt)
+                self._record_wait(pause)
+                await asyncio.sleep(pause)
+                continue
+            self._on_success(estimate, response)
+            return response, latency, attempt
+
+    # --- Reporting ---
+
+    def summarise(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        elapsed = (stats["last"] - stats["first"]) if stats["first"] and stats["last"] else 0.0
+        stats["elapsed"] = elapsed
+        stats["calls_per_min"] = stats["calls"] / elapsed * 60 if elapsed else 0.0
+        stats["tokens_per_min"] = stats["tokens"] / elapsed * 60 if elapsed else 0.0
+        stats["limit"] = self.limiter.limit
+        return stats
+
+    def report(self):
+        stats = self.summarise()
+        if not stats["calls"] and not stats["failures"]:
+            return
+        print(f"--- LLM throughput: {stats['calls']} calls in {stats['elapsed']:.1f}s | "
+              f"{stats['calls_per_min']:.1f} calls/min, {stats['tokens_per_min']:.0f} tokens/min ---")
+        print(f"    Retries: {stats['retries']} ({stats['throttled']} throttled) | failed calls: {stats['failures']} | "
+              f"waiting on rate limits and backoff: {stats['wait']:.1f}s (summed over calls)")
+        print(f"    Concurrent requests: now {stats['limit']}, lowest {stats['min_limit']}, "
+              f"max {definitions.MAX_IN_FLIGHT_LLM_REQUESTS}")
+
+
+# --- One limiter shared by every node, whichever paper or thread it is running for ---
+request_limiter = RequestLimiter(definitions.MAX_IN_FLIGHT_LLM_REQUESTS)
+# --- ...and the governor that paces and retries every request through it ---
+governor = Governor(request_limiter)
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import definitions
+
+
+class ResponseCache:
+    """
+    A persistent, content-addressed store of LLM answers.
+
+    Entries are keyed on (model name, temperature, SHA-256 of the prompt), so re-running the
+    pipeline over the same PDFs with the same prompts never pays for the same call twice.
+    The file is bounded by `max_bytes`; the least recently used answers are evicted first.
+    """
+
+    def __init__(self, path, max_bytes: int, bypass: bool = False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        # Opened lazily and shared by all threads; every access goes through self._lock.
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+                                    key         TEXT PRIMARY KEY,
+                                    model       TEXT,
+                                    temperature REAL,
+                                    content     TEXT,
+                                    size        INTEGER,
+                                    created_at  REAL,
+                                    last_used   REAL
+                                  )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+            self._conn.commit()
+            self._total_bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()[0]
+        return self._conn
+
+    @staticmethod
+    def make_key(model: str, temperature, prompt: str) -> str:
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return hashlib.sha256(json.dumps([model, temperature, prompt_hash]).encode("utf-8")).hexdigest()
+
+    def get(self, key: str):
+        """Returns the cached answer for `key`, or None on a miss (always None when bypassed)."""
+        if self.bypass:
+            self.misses += 1
+            return None
+
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT content FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, model: str, temperature, content: str):
+        """Stores an answer and evicts the least recently used entries if the cache grew too large."""
+        if not content:
+            return
+
+        size = len(content.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            old = conn.execute("SELECT size FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            conn.execute("INSERT OR REPLACE INTO llm_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, model, temperature, content, size, now, now))
+            self._total_bytes += size - (old[0] if old else 0)
+
+            if self._total_bytes > self.max_bytes:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        # Free down to 90% of the budget so we do not evict again on the very next insert.
+        target = int(self.max_bytes * 0.9)
+        rows = conn.execute("SELECT key, size FROM llm_cache ORDER BY last_used ASC").fetchall()
+        for key, size in rows:
+            if self._total_bytes <= target:
+                break
+            conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._total_bytes -= size
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {"hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "bypass": self.bypass}
+
+    def report(self):
+        stats = self.stats()
+        print(f"--- LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+              f"({stats['hit_rate']:.0%} hit rate), {stats['entries']} entries, "
+              f"{stats['bytes'] / 1e6:.1f} MB{' [BYPASSED]' if stats['bypass'] else ''} ---")
+
+
+# --- One cache shared by every node ---
+response_cache = ResponseCache(definitions.LLM_CACHE_PATH, definitions.LLM_CACHE_MAX_BYTES,
+                               bypass=definitions.LLM_CACHE_BYPASS)
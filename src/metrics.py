@@ -0,0 +1,152 @@
+import statistics
+import sys
+import threading
+import time
+import uuid
+from src import utils, database
+import definitions
+
+# Per-call accounting for every LLM request made by the graph nodes. Rows are buffered in
+# memory and written to the `run_metrics` table of the survey DB in batches, so the nodes
+# never wait on SQLite and concurrent papers do not fight over the write lock.
+
+RUN_ID = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+FLUSH_EVERY = 50
+
+_buffer = []
+_writers = []    # Background flushes not yet known to have finished
+_lock = threading.Lock()
+
+
+def _model_name(model: str) -> str:
+    return (model or "").split("/")[-1]
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """Estimated USD cost of one call, from `definitions.MODEL_PRICING` (0 for unknown models)."""
+    input_price, output_price = definitions.MODEL_PRICING.get(_model_name(model), (0.0, 0.0))
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def record_llm_call(node: str, fingerprint: str, model: str, prompt: str = "", response=None,
+                    latency: float = 0.0, retries: int = 0, cached: bool = False):
+    """
+    Records one LLM call. Token counts come from the response's usage metadata when the
+    provider returns it, otherwise they are estimated with `utils.count_tokens`.
+    Answers served from the response cache are recorded with zero tokens and cost.
+    """
+    input_tokens = output_tokens = 0
+    if not cached and response is not None:
+        usage = getattr(response, 'usage_metadata', None) or {}
+        input_tokens = usage.get('input_tokens') or utils.count_tokens(prompt)
+        output_tokens = usage.get('output_tokens') or utils.count_tokens(response.content)
+
+    row = (RUN_ID, time.time(), node, fingerprint, _model_name(model), input_tokens, output_tokens,
+           latency, retries, int(cached), estimate_cost(model, input_tokens, output_tokens))
+
+    with _lock:
+        _buffer.append(row)
+        should_flush = len(_buffer) >= FLUSH_EVERY
+    if should_flush:
+        _flush_in_background()
+
+
+def _take() -> list:
+    """Swaps the buffer out under the lock; the write itself happens outside it."""
+    with _lock:
+        rows = list(_buffer)
+        _buffer.clear()
+    return rows
+
+
+def _flush_in_background():
+    # Async nodes record their calls on the event loop, which must not wait on SQLite.
+    rows = _take()
+    if rows:
+        writer = threading.Thread(target=database.insert_run_metrics, args=(rows,), daemon=True)
+        writer.start()
+        with _lock:
+            _writers.append(writer)
+
+
+def flush():
+    """Writes all buffered rows to the database, after any background writes still in progress."""
+    with _lock:
+        writers = list(_writers)
+        _writers.clear()
+    for writer in writers:
+        writer.join()
+    rows = _take()
+    if rows:
+        database.insert_run_metrics(rows)
+
+
+def _percentile(values: list, q: int) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def summarise(run_id: str = None) -> dict:
+    """Per-node latency percentiles and token/cost totals, plus tokens per paper, for one run (or all)."""
+    rows = database.fetch_run_metrics(run_id)
+
+    per_node = {}
+    per_paper = {}
+    for node, fingerprint, input_tokens, output_tokens, latency, retries, cached, cost in rows:
+        entry = per_node.setdefault(node, {"calls": 0, "cached": 0, "latencies": [], "input_tokens": 0,
+                                           "output_tokens": 0, "retries": 0, "cost": 0.0})
+        entry["calls"] += 1
+        entry["cached"] += cached
+        entry["input_tokens"] += input_tokens
+        entry["output_tokens"] += output_tokens
+        entry["retries"] += retries
+        entry["cost"] += cost
+        if not cached:
+            entry["latencies"].append(latency)
+        if fingerprint:
+            per_paper[fingerprint] = per_paper.get(fingerprint, 0) + input_tokens + output_tokens
+
+    for entry in per_node.values():
+        entry["p50"] = _percentile(entry["latencies"], 50)
+        entry["p95"] = _percentile(entry["latencies"], 95)
+        del entry["latencies"]
+
+    paper_tokens = list(per_paper.values())
+    return {"nodes": per_node,
+            "papers": len(paper_tokens),
+            "tokens_per_paper_mean": statistics.mean(paper_tokens) if paper_tokens else 0,
+            "tokens_per_paper_p50": _percentile(paper_tokens, 50),
+            "tokens_per_paper_p95": _percentile(paper_tokens, 95)}
+
+
+def report(run_id: str = None):
+    summary = summarise(run_id)
+    if not summary["nodes"]:
+        print("--- No LLM calls recorded. ---")
+        return
+
+    print(f"--- LLM call metrics ({'run ' + run_id if run_id else 'all runs'}) ---")
+    print(f"    {'node':<12} {'calls':>6} {'cached':>6} {'p50 s':>7} {'p95 s':>7} "
+          f"{'in tok':>10} {'out tok':>9} {'retries':>7} {'cost $':>8}")
+    total_cost = 0.0
+    for node, entry in sorted(summary["nodes"].items()):
+        total_cost += entry["cost"]
+        print(f"    {node:<12} {entry['calls']:>6} {entry['cached']:>6} {entry['p50']:>7.2f} {entry['p95']:>7.2f} "
+              f"{entry['input_tokens']:>10} {entry['output_tokens']:>9} {entry['retries']:>7} {entry['cost']:>8.2f}")
+    print(f"    Papers: {summary['papers']} | tokens/paper mean {summary['tokens_per_paper_mean']:.0f}, "
+          f"p50 {summary['tokens_per_paper_p50']:.0f}, p95 {summary['tokens_per_paper_p95']:.0f} | "
+          f"estimated cost ${total_cost:.2f}")
+
+
+if __name__ == "__main__":
+    # python -m src.metrics             -> the most recent run
+    # python -m src.metrics all         -> every run in the database
+    # python -m src.metrics <run_id>    -> one specific run
+    database.create_database()
+    argument = sys.argv[1] if len(sys.argv) > 1 else None
+    if argument is None:
+        argument = database.latest_run_id()
+    report(None if argument == "all" else argument)
@@ -1,68 +1,161 @@
+import asyncio
 import json
-import re
-import pymupdf
 from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import AIMessage
 import os
 from src.initialise_state import State
-from src import utils
+from src import llm, llm_cache, ingestion, sections, context, metrics, relevancy, utils
+import definitions
 from dotenv import load_dotenv
 load_dotenv()
 
 from src.prompts.water_demand_forecasting import prompts
 # from src.prompts.power_system_protection import prompts
+from src.prompts.sample import prompts as sample_prompts
 
 # --- Initialize the Gemini client here, so all nodes can share it ---
 api_key = os.environ.get("GOOGLE_API_KEY")
-gemini = ChatGoogleGenerativeAI(model='gemini-2.5-pro', temperature=0.0, google_api_key=api_key)
+# Retries are left to `llm.governor`, which paces them against the shared rate limits.
+gemini = ChatGoogleGenerativeAI(model='gemini-2.5-pro', temperature=0.0, google_api_key=api_key,
+                                max_retries=1, timeout=definitions.LLM_TIMEOUT_S)
+# A small, fast model for the borderline papers of the relevancy cascade (see check_paper_relevancy).
+gemini_flash = ChatGoogleGenerativeAI(model=definitions.RELEVANCY_FLASH_MODEL, temperature=0.0, google_api_key=api_key,
+                                      max_retries=1, timeout=definitions.LLM_TIMEOUT_S)
 
-# --- INGESTION & METADATA NODES ---
-def _locate_landmarks_with_re(text: str) -> dict:
-    """A helper function to find landmarks using regular expressions."""
-    # Define all the patterns in one place for easy management.
-    # We include common variations.
-    landmark_patterns = {
-        "abstract_start": re.compile(r'A\s*B\s*S\s*T\s*R\s*A\s*C\s*T|ABSTRACT', re.IGNORECASE),
-        "keywords_start": re.compile(r'Keywords|Key words|Index Terms', re.IGNORECASE),
-        "introduction_start": re.compile(r'1\.\sIntroduction|Introduction', re.IGNORECASE),
-        "references_start": re.compile(r'References|Bibliography', re.IGNORECASE),
-        "page_end": re.compile(r'--- Page Break ---', re.IGNORECASE)
 
-    }
+def _cache_key(client, prompt: str) -> str:
+    return llm_cache.ResponseCache.make_key(getattr(client, 'model', ''), getattr(client, 'temperature', None), prompt)
+
+
+def _cached_response(client, key: str, node: str, fingerprint: str):
+    cached = llm_cache.response_cache.get(key)
+    if cached is None:
+        return None
+    metrics.record_llm_call(node, fingerprint, getattr(client, 'model', ''), cached=True)
+    return AIMessage(content=cached)
+
+
+def _after_call(client, key: str, prompt: str, response, node: str, fingerprint: str, latency: float, retries: int):
+    """Bookkeeping shared by the sync and async paths once the model has answered."""
+    context.record_latency(node, latency)
+    metrics.record_llm_call(node, fingerprint, getattr(client, 'model', ''), prompt, response, latency, retries)
+    llm_cache.response_cache.put(key, getattr(client, 'model', ''), getattr(client, 'temperature', None), response.content)
+
+
+def _invoke_llm(prompt: str, node: str, fingerprint: str = None, client=None):
+    """
+    Calls a Gemini client (the shared `gemini` unless `client` is given) through `llm.governor`,
+    which holds one of the process-wide request slots, keeps to the rate limits and retries
+    throttled or timed-out calls. Identical (model, temperature, prompt) calls are answered from
+    the local response cache.
+    Every call is recorded in the run metrics under `node` and the paper's fingerprint.
+    """
+    client = client or gemini
+    key = _cache_key(client, prompt)
+    cached = _cached_response(client, key, node, fingerprint)
+    if cached is not None:
+        return cached
+
+    response, latency, retries = llm.governor.call(client.invoke, prompt)
+    _after_call(client, key, prompt, response, node, fingerprint, latency, retries)
+    return response
 
-    landmarks = {}
-    for name, pattern in landmark_patterns.items():
-        match = pattern.search(text)
-        # If a match is found, store its starting index. Otherwise, store -1.
-        landmarks[name] = match.start() if match else -1
 
-    return landmarks
+async def _ainvoke_llm(prompt: str, node: str, fingerprint: str = None, client=None):
+    """Async counterpart of `_invoke_llm`; waits for a request slot without blocking a thread."""
+    client = client or gemini
+    # The cache lookup (which also updates `last_used`) and the write-back both commit to SQLite
+    # under a lock the worker threads share, so they run in a thread rather than on the loop.
+    key = _cache_key(client, prompt)
+    cached = await asyncio.to_thread(_cached_response, client, key, node, fingerprint)
+    if cached is not None:
+        return cached
 
+    response, latency, retries = await llm.governor.acall(client.ainvoke, prompt)
+    await asyncio.to_thread(_after_call, client, key, prompt, response, node, fingerprint, latency, retries)
+    return response
+
+
+# --- INGESTION & METADATA NODES ---
+# The actual parsing/OCR work lives in src/ingestion.py so it can also run in worker processes.
 
 def read_and_locate_landmarks(state: State) -> State:
     print("--- NODE: Reading PDF & Locating Landmarks (RE-based) ---")
+    if state.get('raw_text') is not None and state.get('landmarks') is not None:
+        print("--- INFO: Using text prefetched by the extraction stage. ---")
+        return state
+
+    fingerprint = state.get('fingerprint')
     try:
-        paper = pymupdf.open(state['path'])
-        text = utils.extract_text_from_all_pages(paper)
-        paper.close()
-        state['raw_text'] = text
+        # Pages without a text layer are OCR'd here, before the landmark pass.
+        state['raw_text'], scanned_pages = ingestion.read_text(state['path'], fingerprint)
+        if 0 in scanned_pages:
+            state['ocr_needed'] = True  # The first page is already OCR text; the fallback would add nothing
     except Exception as e:
         print(f"Error reading PDF: {e}")
         state['raw_text'] = ""
 
-    # Use the deterministic helper function instead of an LLM call
-    state['landmarks'] = _locate_landmarks_with_re(state.get('raw_text', ''))
+    # Use the deterministic section index instead of an LLM call
+    state['landmarks'], state['sections'] = ingestion.index_text(fingerprint, state.get('raw_text', ''))
 
     print(f"Landmarks found: {state['landmarks']}")
     return state
 
 
+async def aread_and_locate_landmarks(state: State) -> State:
+    """
+    Async counterpart of `read_and_locate_landmarks`. When the runner's process pool is up, the
+    full text is read there with `ingestion.prefetch_paper`, as the extraction stage does for the
+    default order; this is how the relevancy-first graph reads its relevant papers.
+    """
+    pool = ingestion.prefetch_pool
+    if pool is None or (state.get('raw_text') is not None and state.get('landmarks') is not None):
+        return await asyncio.to_thread(read_and_locate_landmarks, state)
+
+    print("--- NODE: Reading PDF & Locating Landmarks (process pool) ---")
+    try:
+        seeds = await asyncio.get_running_loop().run_in_executor(pool, ingestion.prefetch_paper,
+                                                                 state['path'], state.get('fingerprint'))
+    except Exception as e:
+        print(f"--- WARNING: Reading in the process pool failed, reading here instead: {e} ---")
+        return await asyncio.to_thread(read_and_locate_landmarks, state)
+
+    seeds.pop('title', None)  # Already seeded from the same PDF metadata by extract_from_pdf_metadata
+    state.update(seeds)
+    print(f"Landmarks found: {state['landmarks']}")
+    return state
+
+
+def read_first_pages(state: State) -> State:
+    """
+    Relevancy-first graph: reads only the first `HEAD_PAGES` pages and slices the abstract from
+    them deterministically, so the relevancy check runs before the full text is ever read.
+    """
+    print("--- NODE: Reading First Pages & Slicing the Abstract ---")
+    if state.get('head_text') is not None:
+        print("--- INFO: Using the first pages prefetched by the extraction stage. ---")
+        return state
+
+    if state.get('raw_text') is not None and state.get('landmarks') is not None:
+        # The full text was prefetched anyway; its title block is all that is needed here.
+        state['head_text'], landmarks = state['raw_text'], state['landmarks']
+    else:
+        try:
+            state['head_text'], landmarks = ingestion.read_head(state['path'], state.get('fingerprint'))
+        except Exception as e:
+            print(f"Error reading PDF: {e}")
+            state['head_text'], landmarks = "", {}
+
+    if not state.get('abstract'):
+        state['abstract'] = sections.slice_abstract(state['head_text'], landmarks) or None
+    print(f"Abstract sliced: {'yes' if state.get('abstract') else 'no'}")
+    return state
+
+
 def ocr_and_relocate_landmarks(state: State) -> State:
     print("--- NODE: Performing OCR & Relocating Landmarks (RE-based) ---")
     state['ocr_needed'] = True
-    paper = pymupdf.open(state['path'])
-    page_one = paper.load_page(0)
-    ocr_text = utils.ocr_page_text(page_one)
-    paper.close()
+    ocr_text = ingestion.ocr_first_page(state['path'], state.get('fingerprint'))
 
     # The logic to combine standard and OCR text remains useful.
     raw_text = state.get('raw_text', '')
@@ -70,8 +163,9 @@ def ocr_and_relocate_landmarks(state: State) -> State:
         # A simple way to avoid duplicating the first page is to just prepend OCR text
         state['raw_text'] = ocr_text + "\n" + raw_text
 
-    # Use the same deterministic helper function on the OCR-enhanced text
-    state['landmarks'] = _locate_landmarks_with_re(state.get('raw_text', ''))
+    # Re-index the OCR-enhanced text the same deterministic way
+    state['sections'] = sections.build_section_index(state.get('raw_text', ''))
+    state['landmarks'] = sections.locate_landmarks(state.get('raw_text', ''), state['sections'])
 
     print(f"OCR Landmarks found: {state['landmarks']}")
     return state
@@ -84,11 +178,11 @@ def extract_from_pdf_metadata(state: State) -> State:
     """
     print("--- NODE: Seeding state from direct PDF metadata ---")
     try:
-        paper = pymupdf.open(state['path'])
-        paper.close()
+        # Opening the document here also starts the paper's shared session for the later nodes.
+        metadata = ingestion.read_metadata(state['path'], state.get('fingerprint'))
 
-        if 'title' in paper.metadata:
-            title = paper.metadata['title']
+        if 'title' in metadata:
+            title = metadata['title']
             if title != 'untitled':
                 state['title'] = title
 
@@ -109,6 +203,8 @@ def extract_sliced_metadata(state: State) -> State:
     print("--- NODE: Sliced Metadata Completion (Full) ---")
     text = state.get('raw_text', '')
     landmarks = state.get('landmarks', {})
+    # The text is final from here on; counted once for all the extractors (see context.select_context).
+    state['raw_text_tokens'] = utils.count_tokens(text or '')
 
     if not text:
         return state
@@ -143,7 +239,7 @@ def extract_sliced_metadata(state: State) -> State:
 
 
     try:
-        response = gemini.invoke(prompt)
+        response = _invoke_llm(prompt, 'metadata', state.get('fingerprint'))
         content = response.content.strip("```json\n").strip("`")
         data = json.loads(content)
 
@@ -162,39 +258,83 @@ def extract_sliced_metadata(state: State) -> State:
 
 # --- RELEVANCY & ROUTING NODES ---
 
+def _ask_relevancy(prompt: str, node: str, fingerprint: str, client=None):
+    """One model's yes/no answer, or None when the call or its JSON failed."""
+    try:
+        response = _invoke_llm(prompt, node, fingerprint, client)
+        content = response.content.strip("```json\n").strip("`")
+        return json.loads(content).get('relevancy') is True
+    except Exception as e:
+        print(f"--- ERROR: Relevancy check ({node}) failed: {e} ---")
+        return None
+
+
 def check_paper_relevancy(state: State) -> State:
     """
-    A proper LangGraph node that calls an LLM to check for paper relevancy
-    and updates the 'relevancy' key in the state.
+    A proper LangGraph node that decides paper relevancy with a cascade and updates the
+    'relevancy' key in the state:
+      1. the lexical prefilter (src/relevancy.py) decides clear-cut abstracts without any call;
+      2. borderline ones go to the fast model, which decides when it agrees with the way the
+         lexical score leans;
+      3. otherwise the large model decides.
+    Until the prefilter has enough labelled abstracts to train on, the fast model decides on its
+    own, except for failed calls and a `RELEVANCY_COLD_START_RATE` sample that the large model
+    rules on; only the large model's verdicts become training labels. With
+    `RELEVANCY_CASCADE` off, every paper goes straight to the large model. Which tier decided,
+    and what each tier said, is kept in 'relevancy_info' and logged with the paper's verdict.
     """
     print("--- NODE: Checking Paper Relevancy ---")
-
-    # Use the abstract from the state, which was extracted in the previous step
-    abstract = state.get('abstract', '')
+    fingerprint = state.get('fingerprint')
+    info = {"run_id": metrics.RUN_ID}
+    state['relevancy_info'] = info
+
+    # Use the abstract from the state, which was extracted in the previous step. The relevancy-first
+    # graph has no metadata call before this point; when no abstract could be sliced it falls back
+    # to the start of the first page.
+    abstract = state.get('abstract') or (state.get('head_text') or '')[:definitions.HEAD_FALLBACK_CHARS]
     if not abstract:
         print("--- WARNING: Abstract is missing. Defaulting to Not Relevant. ---")
         state['relevancy'] = True
+        info['decided_by'] = "default"
         return state
 
+    info['abstract'] = abstract  # The text actually classified; logged as the training example
     prompt = prompts.relevancy_check_prompt(abstract)
-    try:
-        # We can use a faster, cheaper model for this simple classification task.
-        # If you have a 'gemini-flash' client, use it here, otherwise 'gemini-1.5-pro' is fine.
-        response = gemini.invoke(prompt)
-        content = response.content.strip("```json\n").strip("`")
-        data = json.loads(content)
-
-        if data.get('relevancy') is True:
-            print("--- Paper is Relevant ---")
-            state['relevancy'] = True
+    if definitions.RELEVANCY_CASCADE:
+        prefilter = relevancy.prefilter()
+        audited = relevancy.in_audit_sample(fingerprint)
+        if prefilter is not None:
+            verdict, score, lean = prefilter.classify(abstract)
+            info.update(score=score, lean=lean, prefilter=verdict)
+            if verdict is not None and not audited:
+                print(f"--- Paper is {'Relevant' if verdict else 'Not Relevant'} (lexical prefilter, score {score:.2f}) ---")
+                state['relevancy'] = verdict
+                info['decided_by'] = "prefilter"
+                return state
+
+        flash = _ask_relevancy(prompt, 'relevancy_flash', fingerprint, gemini_flash)
+        info['flash'] = flash
+        if prefilter is not None:
+            confirmed = flash == lean
         else:
-            print("--- Paper is Not Relevant ---")
-            state['relevancy'] = False
-
-    except Exception as e:
-        print(f"--- ERROR: Relevancy check failed: {e}. Defaulting to Relevant. ---")
-        state['relevancy'] = True  # Default to false on any error
-
+            # Cold start: nothing to check the fast model against, so it decides alone, except
+            # for a sample that the large model rules on to collect the prefilter's first labels.
+            confirmed = not relevancy.in_audit_sample(fingerprint, definitions.RELEVANCY_COLD_START_RATE)
+        if flash is not None and confirmed:
+            print(f"--- Paper is {'Relevant' if flash else 'Not Relevant'} (fast model) ---")
+            state['relevancy'] = flash
+            info['decided_by'] = "flash"
+            return state
+
+    verdict = _ask_relevancy(prompt, 'relevancy', fingerprint)
+    if verdict is None:
+        print("--- Defaulting to Relevant. ---")
+        state['relevancy'] = True
+        info['decided_by'] = "default"
+    else:
+        print(f"--- Paper is {'Relevant' if verdict else 'Not Relevant'} ---")
+        state['relevancy'] = verdict
+        info['decided_by'] = "pro"
     return state
 
 
@@ -210,16 +350,21 @@ def relevant_node(state: State) -> State:
 
 # --- PARALLEL ANALYSIS NODES ---
 
+def _fill_missing_fields(state: State, response) -> State:
+    """Parses the JSON answer of an analysis prompt and fills only the fields that are still empty."""
+    content = response.content.strip("```json\n").strip("`")
+    data = json.loads(content)
+    for key, value in data.items():
+        if key in state and state.get(key) is None: state[key] = value
+    return state
+
+
 def extract_methodology_and_models(state: State) -> State:
     print("--- NODE: Extracting Methodology & Models ---")
-    prompt = prompts.methodology_and_models_prompt(state.get('raw_text', ''))
+    prompt = prompts.methodology_and_models_prompt(context.select_context(state, 'methodology'))
 
     try:
-        response = gemini.invoke(prompt)
-        content = response.content.strip("```json\n").strip("`")
-        data = json.loads(content)
-        for key, value in data.items():
-            if key in state and state.get(key) is None: state[key] = value
+        _fill_missing_fields(state, _invoke_llm(prompt, 'methodology', state.get('fingerprint')))
     except Exception as e:
         print(f"--- ERROR: Methodology extraction failed: {e} ---")
     return state
@@ -227,14 +372,10 @@ def extract_methodology_and_models(state: State) -> State:
 
 def extract_analysis_and_findings(state: State) -> State:
     print("--- NODE: Extracting Analysis & Findings ---")
-    prompt = prompts.analysis_and_findings_prompt(state.get('raw_text', ''))
+    prompt = prompts.analysis_and_findings_prompt(context.select_context(state, 'analysis'))
 
     try:
-        response = gemini.invoke(prompt)
-        content = response.content.strip("```json\n").strip("`")
-        data = json.loads(content)
-        for key, value in data.items():
-            if key in state and state.get(key) is None: state[key] = value
+        _fill_missing_fields(state, _invoke_llm(prompt, 'analysis', state.get('fingerprint')))
     except Exception as e:
         print(f"--- ERROR: Analysis extraction failed: {e} ---")
     return state
@@ -242,14 +383,10 @@ def extract_analysis_and_findings(state: State) -> State:
 
 def extract_dataset_properties(state: State) -> State:
     print("--- NODE: Extracting Dataset Properties ---")
-    prompt = prompts.dataset_properties_prompt(state.get('raw_text', ''))
+    prompt = prompts.dataset_properties_prompt(context.select_context(state, 'dataset'))
 
     try:
-        response = gemini.invoke(prompt)
-        content = response.content.strip("```json\n").strip("`")
-        data = json.loads(content)
-        for key, value in data.items():
-            if key in state and state.get(key) is None: state[key] = value
+        _fill_missing_fields(state, _invoke_llm(prompt, 'dataset', state.get('fingerprint')))
     except Exception as e:
         print(f"--- ERROR: Dataset extraction failed: {e} ---")
     return state
@@ -257,19 +394,99 @@ def extract_dataset_properties(state: State) -> State:
 
 def extract_experimental_setup(state: State) -> State:
     print("--- NODE: Extracting Experimental Setup ---")
-    prompt = prompts.experimental_setup_prompt(state.get('raw_text', ''))
+    prompt = prompts.experimental_setup_prompt(context.select_context(state, 'experiments'))
 
     try:
-        response = gemini.invoke(prompt)
-        content = response.content.strip("```json\n").strip("`")
-        data = json.loads(content)
-        for key, value in data.items():
-            if key in state and state.get(key) is None: state[key] = value
+        _fill_missing_fields(state, _invoke_llm(prompt, 'experiments', state.get('fingerprint')))
     except Exception as e:
         print(f"--- ERROR: Experiment extraction failed: {e} ---")
     return state
 
 
+# --- ASYNC PARALLEL ANALYSIS NODES ---
+# Same work as above, but awaited on the event loop instead of occupying a worker thread each.
+# Registered by `create_graph(use_async=True)`, which is what the concurrent runner uses.
+
+async def aextract_methodology_and_models(state: State) -> State:
+    print("--- NODE: Extracting Methodology & Models (async) ---")
+    context_text = await asyncio.to_thread(context.select_context, state, 'methodology')
+    prompt = prompts.methodology_and_models_prompt(context_text)
+
+    try:
+        _fill_missing_fields(state, await _ainvoke_llm(prompt, 'methodology', state.get('fingerprint')))
+    except Exception as e:
+        print(f"--- ERROR: Methodology extraction failed: {e} ---")
+    return state
+
+
+async def aextract_analysis_and_findings(state: State) -> State:
+    print("--- NODE: Extracting Analysis & Findings (async) ---")
+    context_text = await asyncio.to_thread(context.select_context, state, 'analysis')
+    prompt = prompts.analysis_and_findings_prompt(context_text)
+
+    try:
+        _fill_missing_fields(state, await _ainvoke_llm(prompt, 'analysis', state.get('fingerprint')))
+    except Exception as e:
+        print(f"--- ERROR: Analysis extraction failed: {e} ---")
+    return state
+
+
+async def aextract_dataset_properties(state: State) -> State:
+    print("--- NODE: Extracting Dataset Properties (async) ---")
+    context_text = await asyncio.to_thread(context.select_context, state, 'dataset')
+    prompt = prompts.dataset_properties_prompt(context_text)
+
+    try:
+        _fill_missing_fields(state, await _ainvoke_llm(prompt, 'dataset', state.get('fingerprint')))
+    except Exception as e:
+        print(f"--- ERROR: Dataset extraction failed: {e} ---")
+    return state
+
+
+async def aextract_experimental_setup(state: State) -> State:
+    print("--- NODE: Extracting Experimental Setup (async) ---")
+    context_text = await asyncio.to_thread(context.select_context, state, 'experiments')
+    prompt = prompts.experimental_setup_prompt(context_text)
+
+    try:
+        _fill_missing_fields(state, await _ainvoke_llm(prompt, 'experiments', state.get('fingerprint')))
+    except Exception as e:
+        print(f"--- ERROR: Experiment extraction failed: {e} ---")
+    return state
+
+
+# --- COMBINED ANALYSIS NODE ---
+# Alternative to the four-way fan-out: all four field groups from one call over one shared context.
+# Selected with `create_graph(extraction_mode="combined")`.
+
+def _combined_prompt(state: State) -> str:
+    """The topic module's combined prompt; prompt modules written before combined mode fall back to the sample one."""
+    build = getattr(prompts, 'combined_extraction_prompt', None) or sample_prompts.combined_extraction_prompt
+    return build(context.select_context(state, 'combined'))
+
+
+def extract_all_fields(state: State) -> State:
+    print("--- NODE: Extracting All Analysis Fields (single call) ---")
+
+    try:
+        prompt = _combined_prompt(state)
+        _fill_missing_fields(state, _invoke_llm(prompt, 'combined', state.get('fingerprint')))
+    except Exception as e:
+        print(f"--- ERROR: Combined extraction failed: {e} ---")
+    return state
+
+
+async def aextract_all_fields(state: State) -> State:
+    print("--- NODE: Extracting All Analysis Fields (single call, async) ---")
+
+    try:
+        prompt = await asyncio.to_thread(_combined_prompt, state)
+        _fill_missing_fields(state, await _ainvoke_llm(prompt, 'combined', state.get('fingerprint')))
+    except Exception as e:
+        print(f"--- ERROR: Combined extraction failed: {e} ---")
+    return state
+
+
 def dummy_node(state: State) -> State:
     """A simple node that does nothing but pass the state through, used for joining."""
     print("--- NODE: Joining parallel branches ---")
@@ -0,0 +1,117 @@
+import atexit
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pymupdf
+from src import utils, document
+from src.text_cache import text_cache
+import definitions
+
+# Selective OCR: only pages without a usable text layer are rendered and sent to Tesseract,
+# at a resolution matched to the page size, spread over a process pool and cached per page.
+
+
+def ocr_dpi(width: float, height: float) -> int:
+    """Picks the render resolution so the page's long side comes out at about OCR_TARGET_LONG_SIDE_PX."""
+    long_side_inches = max(width, height) / 72
+    if long_side_inches <= 0:
+        return definitions.OCR_MIN_DPI
+    dpi = int(definitions.OCR_TARGET_LONG_SIDE_PX / long_side_inches)
+    return max(definitions.OCR_MIN_DPI, min(definitions.OCR_MAX_DPI, dpi))
+
+
+def text_layer_density(text: str, width: float, height: float) -> float:
+    """Non-blank characters per square inch of page."""
+    area = (width / 72) * (height / 72)
+    if area <= 0:
+        return 0.0
+    return len("".join(text.split())) / area
+
+
+def needs_ocr(session: document.DocumentSession, index: int, text: str) -> bool:
+    """
+    Whether the page looks scanned: almost no text layer but at least one image. Pages that are
+    simply blank have no images and are left alone. Only pages below the density threshold are
+    probed for images.
+    """
+    density = text_layer_density(text, *session.page_size(index))
+    return density < definitions.OCR_MIN_TEXT_DENSITY and session.has_images(index)
+
+
+def _ocr_page(path: str, index: int) -> str:
+    # Runs in a worker process, which has its own copy of MuPDF, so it opens the file itself.
+    with pymupdf.open(path) as doc:
+        page = doc.load_page(index)
+        return utils.ocr_page_text(page, dpi=ocr_dpi(page.rect.width, page.rect.height))
+
+
+def _ocr_session_page(session: document.DocumentSession, index: int) -> str:
+    # Rendering holds the MuPDF lock; Tesseract runs outside it, so other papers' PyMuPDF calls
+    # are not stalled for the seconds a page takes to recognise.
+    try:
+        image = session.render_page(index, ocr_dpi(*session.page_size(index)))
+    except Exception as e:
+        print(f"--- OCR Error: {e} ---")
+        return ""
+    return utils.ocr_image(image)
+
+
+def _init_worker(settings: dict, text_cache_path):
+    # A spawned worker imports everything afresh; carry over the settings the parent may have
+    # changed at runtime (e.g. the benchmarks point the text cache at a scratch directory).
+    for name, value in settings.items():
+        setattr(definitions, name, value)
+    text_cache.path = text_cache_path
+    text_cache._conn = None
+
+
+def spawn_pool(max_workers: int) -> ProcessPoolExecutor:
+    """
+    A process pool whose workers are spawned rather than forked. The pools are created while
+    graph threads may hold the MuPDF lock, the text cache lock or SQLite connections, and a fork
+    copies those locks in whatever state they are in.
+    """
+    settings = {name: value for name, value in vars(definitions).items() if name.isupper()}
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=_init_worker, initargs=(settings, text_cache.path))
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Created lazily, possibly from several graph threads at once.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = spawn_pool(definitions.OCR_WORKERS)
+            atexit.register(_pool.shutdown)
+    return _pool
+
+
+def ocr_pages(path: str, fingerprint: str, indices: list, parallel: bool = True) -> dict:
+    """
+    OCRs the given pages and returns {page index (str): text}. Pages OCR'd by an earlier run
+    come from the text cache; the rest are spread over the OCR process pool.
+
+    Args:
+        parallel: Use the process pool for multi-page jobs. Callers that already run inside a
+            worker process (the prefetch stage) pass False and OCR their pages in turn.
+    """
+    # OCR output is kept per page; JSON object keys are strings.
+    cached = text_cache.get(fingerprint, 'ocr') or {}
+    missing = [index for index in indices if str(index) not in cached]
+
+    if missing:
+        print(f"--- INFO: OCR of {len(missing)} page(s) of {path} ---")
+        if parallel and len(missing) > 1:
+            texts = list(_get_pool().map(_ocr_page, [path] * len(missing), missing))
+        else:
+            session = document.get_session(path)
+            texts = [_ocr_session_page(session, index) for index in missing]
+        for index, text in zip(missing, texts):
+            cached[str(index)] = text
+        text_cache.put(fingerprint, 'ocr', cached)
+
+    return {str(index): cached[str(index)] for index in indices}
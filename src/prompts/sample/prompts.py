@@ -59,4 +59,18 @@ def experimental_setup_prompt(raw_text: str) -> str:
     From the paper text, extract the experimental setup details: train/test split, forecast horizon, data resolution, features used, preprocessing steps, evaluation metrics, and data/code availability. Output ONLY the JSON.
     JSON: {{"train_test_split":"", "horizon":"", "resolution":"", "features_used":[], "data_preprocessing":[], "metrics":[], "data_availability":"", "code_availability":""}}
     Paper Text: --- {raw_text} ---
-    """
\ No newline at end of file
+    """
+
+def combined_extraction_prompt(raw_text: str) -> str:
+    return f"""
+    From the paper text, extract all of the following in a single JSON object. Output ONLY the JSON.
+    - Methodology & models: the proposed model name, a detailed methodology summary, the unique selling proposition (USP), and a list of all empirically evaluated methods (proposed + baselines).
+    - Analysis & findings: the problem statement, main findings, author-stated limitations, and future work.
+    - Dataset: the dataset's name, source type (real/simulated), granularity/scale, total duration, number of data points, and a brief description.
+    - Experimental setup: train/test split, forecast horizon, data resolution, features used, preprocessing steps, evaluation metrics, and data/code availability.
+    JSON: {{"proposed_model_name":"", "methodology":"", "usp":"", "experimental_methods":[],
+            "problem_statement":"", "main_findings":"", "limitations":"", "future_work":"",
+            "dataset_name":"", "source_type":"", "granularity_scale":"", "dataset_duration":"", "num_data_points":"", "data_description":"",
+            "train_test_split":"", "horizon":"", "resolution":"", "features_used":[], "data_preprocessing":[], "metrics":[], "data_availability":"", "code_availability":""}}
+    Paper Text: --- {raw_text} ---
+    """
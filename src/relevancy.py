@@ -0,0 +1,230 @@
+import hashlib
+import math
+import re
+import sys
+import threading
+import definitions
+from src import database
+
+try:
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+except ImportError:  # scikit-learn is optional; the keyword scorer below is used without it
+    TfidfVectorizer = LogisticRegression = None
+
+# Tier 1 of the relevancy cascade (see `nodes.check_paper_relevancy`): a lexical classifier over
+# the abstract, trained on the verdicts the LLMs gave in earlier runs. It only decides the
+# abstracts it is confident about; its thresholds are chosen on cross-validated scores so that
+# those decisions meet `RELEVANCY_PREFILTER_PRECISION`. Everything in between goes to the fast
+# model, and on to the large one when the two disagree. Only the large model's verdicts are used
+# as labels. Until there are enough of them, the fast model decides alone and the large one rules
+# on its failures and on a `RELEVANCY_COLD_START_RATE` sample.
+
+LLM_SOURCES = ("flash", "pro")    # Tiers that ask an LLM, compared against each other in the report
+LABEL_SOURCES = ("pro",)          # Verdicts used as training labels: the large model's only
+FOLDS = 5
+
+_WORD = re.compile(r"[a-z][a-z0-9\-]{2,}")
+_STOPWORDS = frozenset("""the and for with this that from are was were which their these those have has been
+    can using use used our its into than also such more most other both each between based paper study
+    propose proposed approach method results show shows new two one not but all may about over under""".split())
+
+
+def terms(text: str) -> set:
+    """Distinct lower-cased words and adjacent word pairs, without stopwords."""
+    words = [w for w in _WORD.findall((text or "").lower()) if w not in _STOPWORDS]
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+class KeywordScorer:
+    """
+    Keyword scoring without dependencies: naive Bayes log-odds over the terms of the abstract.
+    Each term counts for how much more often it appears in relevant abstracts than in the others.
+    """
+
+    name = "keywords"
+
+    def fit(self, texts: list, labels: list):
+        self.counts = ({}, {})
+        self.docs = [0, 0]
+        for text, label in zip(texts, labels):
+            self.docs[label] += 1
+            for term in terms(text):
+                self.counts[label][term] = self.counts[label].get(term, 0) + 1
+        self.prior = math.log((self.docs[1] + 1) / (self.docs[0] + 1))
+        return self
+
+    def score(self, text: str) -> float:
+        """Log-odds that the abstract is relevant; > 0 leans relevant."""
+        total = self.prior
+        for term in terms(text):
+            relevant, other = self.counts[1].get(term, 0), self.counts[0].get(term, 0)
+            if relevant or other:
+                total += math.log((relevant + 1) / (self.docs[1] + 2)) - math.log((other + 1) / (self.docs[0] + 2))
+        return total
+
+
+class TfidfScorer:
+    """TF-IDF over words and word pairs with a logistic regression, when scikit-learn is installed."""
+
+    name = "tfidf"
+
+    def fit(self, texts: list, labels: list):
+        self.vectorizer = TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True, stop_words="english")
+        self.model = LogisticRegression(class_weight="balanced", max_iter=1000)
+        self.model.fit(self.vectorizer.fit_transform(texts), labels)
+        return self
+
+    def score(self, text: str) -> float:
+        return float(self.model.decision_function(self.vectorizer.transform([text or ""]))[0])
+
+
+def _make_scorer():
+    return TfidfScorer() if TfidfVectorizer is not None else KeywordScorer()
+
+
+def _cross_validated_scores(texts: list, labels: list) -> list:
+    """Each example scored by a model trained without it (deterministic folds)."""
+    scores = [0.0] * len(texts)
+    for fold in range(FOLDS):
+        train = [i for i in range(len(texts)) if i % FOLDS != fold]
+        scorer = _make_scorer().fit([texts[i] for i in train], [labels[i] for i in train])
+        for i in range(fold, len(texts), FOLDS):
+            scores[i] = scorer.score(texts[i])
+    return scores
+
+
+def _threshold(pairs: list, target: int, precision: float, min_support: int):
+    """
+    Walks (score, label) pairs from the most confident end and returns the score of the deepest
+    `target` example at which the share of `target` labels is still at least `precision` (None if
+    nowhere). Cutting only at `target` examples keeps the band from reaching into the other class.
+    """
+    threshold, hits = None, 0
+    for count, (score, label) in enumerate(pairs, start=1):
+        hits += label == target
+        if label == target and count >= min_support and hits / count >= precision:
+            threshold = score
+    return threshold
+
+
+class Prefilter:
+    def __init__(self, texts: list, labels: list):
+        scores = _cross_validated_scores(texts, labels)
+        pairs = sorted(zip(scores, labels), reverse=True)
+        min_support = max(5, len(texts) // 20)
+        precision = definitions.RELEVANCY_PREFILTER_PRECISION
+
+        high = _threshold(pairs, 1, precision, min_support)
+        low = _threshold(list(reversed(pairs)), 0, precision, min_support)
+        self.high = math.inf if high is None else high
+        self.low = -math.inf if low is None else low
+        if self.low >= self.high:  # Overlapping bands mean no clear-cut region at all
+            self.low, self.high = -math.inf, math.inf
+
+        # Borderline scores lean towards the nearer band; without both bands, by the score's sign.
+        self.midpoint = (self.low + self.high) / 2 if math.isfinite(self.low + self.high) else 0.0
+
+        self.scorer = _make_scorer().fit(texts, labels)
+        self.size = len(texts)
+
+    def classify(self, abstract: str) -> tuple:
+        """Returns (verdict, score, lean): the verdict is None for borderline abstracts."""
+        score = self.scorer.score(abstract)
+        if score >= self.high:
+            verdict = True
+        elif score <= self.low:
+            verdict = False
+        else:
+            verdict = None
+        return verdict, score, score > self.midpoint
+
+
+_prefilter = None
+_loaded = False
+_lock = threading.Lock()
+
+
+def prefilter():
+    """
+    The prefilter trained on the labels in the survey DB, built once per process. None until
+    there are `RELEVANCY_MIN_LABELS` labelled abstracts with `RELEVANCY_MIN_PER_CLASS` of each class.
+    """
+    global _prefilter, _loaded
+    with _lock:
+        if not _loaded:
+            _loaded = True
+            rows = database.fetch_relevancy_labels(LABEL_SOURCES)
+            texts = [abstract for abstract, _ in rows]
+            labels = [int(relevant) for _, relevant in rows]
+            positives = sum(labels)
+            if len(rows) < definitions.RELEVANCY_MIN_LABELS or \
+                    min(positives, len(rows) - positives) < definitions.RELEVANCY_MIN_PER_CLASS:
+                print(f"--- Relevancy prefilter off: {len(rows)} labelled abstracts ({positives} relevant) so far. ---")
+            else:
+                _prefilter = Prefilter(texts, labels)
+                print(f"--- Relevancy prefilter ({_prefilter.scorer.name}) trained on {len(rows)} abstracts; "
+                      f"decides scores <= {_prefilter.low:.2f} or >= {_prefilter.high:.2f}. ---")
+    return _prefilter
+
+
+def in_audit_sample(fingerprint: str, rate: float = None) -> bool:
+    """
+    A fixed share (`RELEVANCY_AUDIT_RATE` by default) of papers still go to the next tier even
+    when the current one is sure, to measure it. The same papers are picked on every run.
+    """
+    if rate is None:
+        rate = definitions.RELEVANCY_AUDIT_RATE
+    digest = hashlib.sha256((fingerprint or "").encode("utf-8")).hexdigest()
+    return int(digest[:8], 16) / 16 ** 8 < rate
+
+
+def _agreement(pairs: list) -> str:
+    if not pairs:
+        return "n/a"
+    agree = sum(a == b for a, b in pairs)
+    return f"{agree / len(pairs):.0%} of {len(pairs)}"
+
+
+def summarise(run_id: str = None) -> dict:
+    rows = database.fetch_relevancy_decisions(run_id)
+    tiers = {}
+    for row in rows:
+        tiers[row[1]] = tiers.get(row[1], 0) + 1
+
+    by_llm = [row for row in rows if row[1] in LLM_SOURCES]
+    return {"papers": len(rows),
+            "tiers": tiers,
+            "skip_rate": tiers.get("prefilter", 0) / len(rows) if rows else 0.0,
+            # Audited clear-cut cases: the prefilter's verdict against the LLM's
+            "prefilter_agreement": _agreement([(prefilter_verdict, relevancy) for relevancy, _, _, prefilter_verdict, _ in by_llm
+                                               if prefilter_verdict is not None]),
+            # Borderline cases: which way the lexical score leaned against the LLM's verdict
+            "lean_agreement": _agreement([(lean, relevancy) for relevancy, _, lean, prefilter_verdict, _ in by_llm
+                                          if lean is not None and prefilter_verdict is None]),
+            # Escalated cases: the fast model against the large one
+            "flash_pro_agreement": _agreement([(flash, relevancy) for relevancy, decided_by, _, _, flash in by_llm
+                                               if decided_by == "pro" and flash is not None])}
+
+
+def report(run_id: str = None):
+    summary = summarise(run_id)
+    if not summary["papers"]:
+        return
+    tiers = ", ".join(f"{tier} {count}" for tier, count in sorted(summary["tiers"].items(), key=lambda t: str(t[0])))
+    print(f"--- Relevancy cascade ({'run ' + run_id if run_id else 'all runs'}): {summary['papers']} papers | {tiers} ---")
+    print(f"    Decided without an LLM call: {summary['skip_rate']:.0%}")
+    print(f"    Agreement with the LLM - prefilter (audited): {summary['prefilter_agreement']} | "
+          f"lexical lean on borderline papers: {summary['lean_agreement']} | "
+          f"fast vs large model: {summary['flash_pro_agreement']}")
+
+
+if __name__ == "__main__":
+    # python -m src.relevancy             -> the most recent run
+    # python -m src.relevancy all         -> every run in the database
+    # python -m src.relevancy <run_id>    -> one specific run
+    database.create_database()
+    argument = sys.argv[1] if len(sys.argv) > 1 else None
+    if argument is None:
+        argument = database.latest_run_id()
+    report(None if argument == "all" else argument)
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from src import initialise_state, database, document, ingestion, ocr, tracing, checkpoint
+import definitions
+
+
+async def _process_paper(graph, paper_path: str, fingerprint: str, seeds: dict = None):
+    """Runs one paper through the compiled graph and returns its final state (or None on failure)."""
+    file_name = os.path.basename(paper_path)
+    print(f"--- PROCESSING {file_name}: {paper_path} ---")
+
+    initial_state = initialise_state.initialise_state()
+    initial_state['path'] = paper_path
+    initial_state['fingerprint'] = fingerprint
+    # Fields already produced by the prefetch stage; the ingestion nodes skip their work for these.
+    initial_state.update(seeds or {})
+
+    try:
+        with document.paper_session(paper_path):
+            return await checkpoint.ainvoke(graph, initial_state)
+    except Exception as e:
+        print(f"--- ERROR: Graph run failed for {file_name}: {e} ---")
+        return None
+
+
+async def _worker(graph, ready_queue: asyncio.Queue, write_queue: asyncio.Queue):
+    """LLM stage: takes extracted papers off the ready queue until it receives the stop marker."""
+    while True:
+        item = await ready_queue.get()
+        if item is None:
+            break
+        index, paper_path, fingerprint, seeds = item
+        final_state = await _process_paper(graph, paper_path, fingerprint, seeds)
+        await write_queue.put((index, paper_path, final_state))
+
+
+async def _prefetch(pool, paper_path: str, fingerprint: str) -> dict:
+    loop = asyncio.get_running_loop()
+    try:
+        # Spans recorded inside the worker process are not collected; this one covers the whole stage.
+        with tracing.span("prefetch", os.path.basename(paper_path)):
+            # The relevancy-first graph only needs the first pages up front; the full text of
+            # the papers found relevant is read later in this same pool (nodes.aread_and_locate_landmarks).
+            prefetch = ingestion.prefetch_head if definitions.RELEVANCY_FIRST else ingestion.prefetch_paper
+            return await loop.run_in_executor(pool, prefetch, paper_path, fingerprint)
+    except Exception as e:
+        # The graph's own ingestion nodes will retry (and report) the extraction for this paper.
+        print(f"--- WARNING: Prefetch failed for {os.path.basename(paper_path)}: {e} ---")
+        return {}
+
+
+async def _extraction_stage(pool, paper_list: list, ready_queue: asyncio.Queue, depth: int, n_consumers: int):
+    """
+    Extraction stage: keeps up to `depth` papers being parsed/OCR'd in the process pool and hands
+    finished ones to the LLM stage. The ready queue is bounded too, so at most about 2 x depth
+    extracted papers are ever held in memory. Without a pool the graph does its own extraction.
+    """
+    if pool is None:
+        for index, (paper_path, fingerprint) in enumerate(paper_list):
+            await ready_queue.put((index, paper_path, fingerprint, {}))
+    else:
+        async def extract(index, paper_path, fingerprint):
+            return index, paper_path, fingerprint, await _prefetch(pool, paper_path, fingerprint)
+
+        in_flight = set()
+        for index, (paper_path, fingerprint) in enumerate(paper_list):
+            in_flight.add(asyncio.create_task(extract(index, paper_path, fingerprint)))
+            if len(in_flight) >= depth:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    await ready_queue.put(task.result())
+        while in_flight:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                await ready_queue.put(task.result())
+
+    for _ in range(n_consumers):
+        await ready_queue.put(None)
+
+
+def _save_results(batch: list) -> int:
+    """Writes a batch of (path, final_state) results in one transaction; returns how many were relevant."""
+    results = [(paper_path, final_state, final_state.get('relevancy') is True)
+               for paper_path, final_state in batch if final_state is not None]
+    with tracing.span("db_write", f"{len(results)} papers"):
+        committed = database.save_results(results)
+    if not committed:
+        # The checkpoints stay, so the next run picks these papers up from their finished state.
+        return 0
+    checkpoint.prune([final_state['fingerprint'] for _, final_state, _ in results])
+    for paper_path, _, relevant in results:
+        file_name = os.path.basename(paper_path)
+        if relevant:
+            print(f"--- Saved relevant paper {file_name} to database. ---\n")
+        else:
+            print(f"--- Discarded paper {file_name} - not relevant. ---\n")
+    return sum(relevant for _, _, relevant in results)
+
+
+async def _db_writer(write_queue: asyncio.Queue, ordered: bool) -> int:
+    """
+    The single consumer that owns every database write, so upserts never interleave.
+    Whatever has queued up while the previous batch was being written goes into the next
+    transaction together. In ordered mode results are held back until all earlier papers
+    have been written.
+    """
+    saved = 0
+    pending = {}
+    next_index = 0
+    finished = False
+
+    while not finished:
+        items = [await write_queue.get()]
+        while not write_queue.empty():
+            items.append(write_queue.get_nowait())
+
+        batch = []
+        for item in items:
+            if item is None:
+                finished = True
+                continue
+            index, paper_path, final_state = item
+            if not ordered:
+                batch.append((paper_path, final_state))
+                continue
+            pending[index] = (paper_path, final_state)
+            while next_index in pending:
+                batch.append(pending.pop(next_index))
+                next_index += 1
+
+        if batch:
+            saved += await asyncio.to_thread(_save_results, batch)
+
+    return saved
+
+
+async def run_papers(graph, paper_list: list, max_in_flight_papers: int = None, ordered: bool = None) -> int:
+    """
+    Drives the compiled graph for several papers at once with a fixed-size worker pool,
+    fed by a process pool that extracts text and OCR for the next papers ahead of time.
+
+    Args:
+        graph: The compiled graph from `create_graph()`.
+        paper_list: (path, fingerprint) pairs for the papers that still need processing.
+        max_in_flight_papers: How many papers are inside `graph.ainvoke` at the same time.
+        ordered: Whether results are written in the order of `paper_list`.
+
+    Returns:
+        int: The number of relevant papers written to the database.
+    """
+    if max_in_flight_papers is None:
+        max_in_flight_papers = definitions.MAX_IN_FLIGHT_PAPERS
+    if ordered is None:
+        ordered = definitions.ORDERED_RESULTS
+
+    # Sync nodes are run by LangGraph on the loop's default executor. Size it so that every
+    # in-flight paper can have all four parallel extraction branches running at once, even with
+    # a graph built from the sync nodes (the async ones never touch this pool).
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max_in_flight_papers * 4))
+
+    # The queue is bounded so finished states cannot pile up faster than they are written.
+    write_queue = asyncio.Queue(maxsize=max_in_flight_papers)
+    writer = asyncio.create_task(_db_writer(write_queue, ordered))
+
+    # Two stages: CPU-bound extraction in worker processes feeds the network-bound LLM stage.
+    # The pool lives until the last paper leaves the graph, since the relevancy-first graph
+    # sends the full-text read of each relevant paper back to it.
+    depth = definitions.PREFETCH_DEPTH
+    pool = ocr.spawn_pool(definitions.PREFETCH_WORKERS) if depth > 0 else None
+    ingestion.prefetch_pool = pool
+    n_workers = min(max_in_flight_papers, len(paper_list))
+    ready_queue = asyncio.Queue(maxsize=max(1, depth))
+    start = time.perf_counter()
+    extraction = asyncio.create_task(_extraction_stage(pool, paper_list, ready_queue, depth, n_workers))
+    workers = [asyncio.create_task(_worker(graph, ready_queue, write_queue)) for _ in range(n_workers)]
+
+    try:
+        await asyncio.gather(extraction, *workers)
+    finally:
+        ingestion.prefetch_pool = None
+        if pool is not None:
+            pool.shutdown()
+        await write_queue.put(None)
+        saved = await writer
+
+    elapsed = time.perf_counter() - start
+    if paper_list and elapsed > 0:
+        print(f"--- Processed {len(paper_list)} papers in {elapsed:.1f}s "
+              f"({len(paper_list) / elapsed * 60:.1f} papers/min, {saved} saved) ---")
+    return saved
+
+
+def run(graph, paper_list: list, **kwargs) -> int:
+    """Synchronous entry point for `main.py`."""
+    return asyncio.run(run_papers(graph, paper_list, **kwargs))
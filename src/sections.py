@@ -0,0 +1,167 @@
+import re
+
+# A single-pass index of the section headings in a paper's extracted text.
+# One compiled alternation is run once over the text; every heading is recorded with its
+# character offset and page, so later stages can slice sections out without rescanning.
+
+PAGE_BREAK = "--- Page Break ---"
+
+# Within each kind, longer names come before their prefixes ("Data description" before "Data"),
+# otherwise the prefix wins and the rest of the name is left over as the heading's tail.
+_HEADING = re.compile(r"""
+    ^[ \t]*
+    (?:(?P<number>\d{1,2}(?:\.\d{1,2}){0,3}|[IVX]{1,4})[.)]?[ \t]+)?
+    (?:
+        (?P<abstract>A\s*B\s*S\s*T\s*R\s*A\s*C\s*T|Abstract)
+      | (?P<keywords>Keywords|Key\s+words|Index\s+Terms)
+      | (?P<introduction>Introduction)
+      | (?P<methodology>Methodology|Methods?|Materials\s+and\s+methods|Proposed\s+(?:method|model|approach|framework)|Model\s+development)
+      | (?P<data>Data\s+(?:description|collection|sources?)|Data(?:\s*sets?)?|Study\s+area(?:\s+and\s+data)?|Case\s+study)
+      | (?P<experiments>Experiments?|Experimental\s+(?:setup|set-up|design|settings?)|Implementation(?:\s+details)?)
+      | (?P<results>Results(?:\s+and\s+discussions?)?|Discussions?|Evaluation|Performance\s+evaluation)
+      | (?P<conclusion>Conclusions?(?:\s+and\s+future\s+(?:work|research))?|Concluding\s+remarks|Summary\s+and\s+conclusions?)
+      | (?P<references>References|Bibliography)
+      | (?P<page_break>---\ Page\ Break\ ---)
+      | (?P<other>[A-Z][^\n]{2,60})
+    )
+    (?![A-Za-z])
+    (?P<tail>[^\n]*)$
+    """, re.IGNORECASE | re.MULTILINE | re.VERBOSE)
+
+SECTION_NAMES = ("abstract", "keywords", "introduction", "methodology", "data", "experiments",
+                 "results", "conclusion", "references", "page_break", "other")
+
+# Loose patterns kept from the original landmark finder, used only when no heading line was found.
+_LOOSE_FALLBACK = {
+    "abstract": re.compile(r'A\s*B\s*S\s*T\s*R\s*A\s*C\s*T|ABSTRACT', re.IGNORECASE),
+    "keywords": re.compile(r'Keywords|Key words|Index Terms', re.IGNORECASE),
+    "introduction": re.compile(r'1\.\sIntroduction|Introduction', re.IGNORECASE),
+}
+
+
+def _is_heading(name: str, number, tail: str, match_text: str) -> bool:
+    """Filters the candidate lines down to real headings."""
+    if name in ("page_break", "abstract", "keywords"):
+        # "Abstract" and "Keywords" are often followed by their content on the same line.
+        return True
+    if name == "other":
+        # Unknown headings are only trusted when numbered and short, e.g. "5. Sensitivity analysis".
+        # Digits after the number usually mean a table row or a list item rather than a heading.
+        words = match_text.split()
+        return (number is not None and len(words) <= 8 and not match_text.rstrip().endswith(".")
+                and match_text.strip()[:1].isupper() and not any(ch.isdigit() for ch in match_text))
+    if number is not None:
+        return len(tail) <= 60 and not any(ch.isdigit() for ch in tail)
+    # Unnumbered headings must stand alone on their line.
+    return tail.strip() in ("", ":", ".")
+
+
+def _scan(text: str):
+    """Yields (name, title, char offset, page) for every heading and page break, in order."""
+    page = 0
+    for match in _HEADING.finditer(text):
+        name = next(n for n in SECTION_NAMES if match.group(n) is not None)
+
+        number = match.group("number")
+        if not _is_heading(name, number, match.group("tail"), match.group(name) + match.group("tail")):
+            continue
+
+        if name == "page_break":
+            yield name, PAGE_BREAK, match.start(), page
+            page += 1
+            continue
+
+        yield name, match.group(0).strip(), match.start(), page
+
+
+def _level(title: str) -> int:
+    match = re.match(r'\s*(\d{1,2}(?:\.\d{1,2})*)', title)
+    return match.group(1).count(".") + 1 if match else 1
+
+
+def build_section_index(text: str) -> list:
+    """
+    Returns the ordered list of section headings found in `text`.
+
+    Each entry is {"name", "title", "char", "page", "level"}: `name` is one of the known
+    section kinds ("abstract", "introduction", "methodology", "data", "experiments",
+    "results", "conclusion", "references", ...) or "other" for a numbered heading we do not
+    classify, `char` is the offset of the heading line and `level` its numbering depth.
+    """
+    return [{"name": name, "title": title, "char": char, "page": page, "level": _level(title)}
+            for name, title, char, page in _scan(text) if name != "page_break"]
+
+
+def locate_landmarks(text: str, sections: list = None) -> dict:
+    """
+    Derives the legacy landmark offsets (-1 when absent) from the section index.
+    The first heading of each kind wins; references use the last heading, since the word
+    also appears in the body. Abstract, keywords and introduction fall back to a loose search
+    when no heading line was found for them.
+    """
+    if sections is None:
+        sections = build_section_index(text)
+
+    first = {}
+    last_references = -1
+    for entry in sections:
+        first.setdefault(entry["name"], entry["char"])
+        if entry["name"] == "references":
+            last_references = entry["char"]
+
+    for name, pattern in _LOOSE_FALLBACK.items():
+        if name not in first:
+            match = pattern.search(text)
+            if match:
+                first[name] = match.start()
+
+    return {"abstract_start": first.get("abstract", -1),
+            "keywords_start": first.get("keywords", -1),
+            "introduction_start": first.get("introduction", -1),
+            "references_start": last_references,
+            "page_end": text.find(PAGE_BREAK)}
+
+
+_ABSTRACT_LABEL = re.compile(r'^\W*(?:A\s*B\s*S\s*T\s*R\s*A\s*C\s*T)\W*', re.IGNORECASE)
+
+
+def slice_abstract(text: str, landmarks: dict, max_chars: int = 4000) -> str:
+    """
+    Cuts the abstract out of the text deterministically: from the Abstract heading to the
+    Keywords or Introduction heading, whichever follows first (at most `max_chars`), without
+    the heading itself. Returns "" when no abstract heading was found.
+    """
+    start = landmarks.get('abstract_start', -1)
+    if start == -1:
+        return ""
+    ends = [landmarks.get(name, -1) for name in ('keywords_start', 'introduction_start')]
+    ends = [end for end in ends if end > start]
+    end = min(ends + [start + max_chars])
+    abstract = _ABSTRACT_LABEL.sub("", text[start:end].replace(PAGE_BREAK, " "), count=1)
+    return " ".join(abstract.split())
+
+
+def section_span(sections: list, name: str, text_length: int) -> tuple:
+    """
+    Returns (start, end) character offsets of the section called `name`: from its heading to the
+    next heading at the same or a higher level. (-1, -1) if it is absent. When several headings
+    have that name, the shallowest (then the first) wins, so "3. Data" is preferred over an
+    earlier "2.1 Data preprocessing".
+    """
+    matches = [i for i, entry in enumerate(sections) if entry["name"] == name]
+    if not matches:
+        return -1, -1
+    i = min(matches, key=lambda index: sections[index]["level"])
+    entry = sections[i]
+    end = text_length
+    for following in sections[i + 1:]:
+        if following["level"] <= entry["level"]:
+            end = following["char"]
+            break
+    return entry["char"], end
+
+
+def section_text(text: str, sections: list, name: str) -> str:
+    """Slices one section out of `text` using the index (empty string if it is absent)."""
+    start, end = section_span(sections, name, len(text))
+    return text[start:end] if start != -1 else ""
@@ -1,86 +1,136 @@
 import streamlit as st
 import sqlite3
 import pandas as pd
-import json
 import os
+from src import database
+# The formatters moved to src/display.py (they also run at write time); kept importable from here.
+from src.display import safe_json_loads, format_metrics, format_simple_list
 
 
-# We cache the data loading to make the app faster.
-@st.cache_data
-def get_all_papers(db_path: str):
-    """Fetches all paper data from a dynamically provided database path."""
+def data_version(db_path: str) -> tuple:
+    """
+    Changes whenever the database does: the modification times and sizes of the DB file and its
+    WAL (committed writes land in the WAL first). Passed to the cached loaders below, so their
+    cache entries are keyed on it and go stale as soon as the pipeline writes.
+    """
+    version = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            version.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            version.append(None)
+    return tuple(version)
+
+
+def _read_query(db_path: str, query: str, params: tuple = ()) -> pd.DataFrame:
     if not os.path.exists(db_path):
         st.error(f"Database file not found at: {db_path}")
         return pd.DataFrame()
 
     try:
-        conn = sqlite3.connect(db_path)
-        df = pd.read_sql_query("SELECT * FROM papers", conn)
-        conn.close()
-        return df
-    except pd.errors.DatabaseError:
+        # Read-only, so the dashboard never holds a lock the running pipeline would wait on.
+        conn = database.connect_readonly(db_path)
+        try:
+            return pd.read_sql_query(query, conn, params=params)
+        finally:
+            conn.close()
+    except (pd.errors.DatabaseError, sqlite3.Error):
         # This can happen if the DB file is empty or the table doesn't exist.
         return pd.DataFrame()
 
 
-def safe_json_loads(s):
-    """Safely loads a JSON string, returning an empty list if it fails."""
-    if not s or pd.isna(s):
-        return []
-    try:
-        # Handle cases where the string might be a representation of a list of strings
-        s = s.replace("'", "\"")
-        data = json.loads(s)
-        # Ensure the output is a list for consistency
-        return data if isinstance(data, list) else [data]
-    except (json.JSONDecodeError, TypeError):
-        # If it's just a plain string, return it in a list
-        return [s] if s else []
-
-
-def format_metrics(metrics_json_string: str) -> str:
+# We cache the data loading to make the app faster.
+@st.cache_data
+def get_paper_list(db_path: str, version: tuple = None) -> pd.DataFrame:
     """
-    Intelligently formats the 'metrics' data for display.
-    This version is robust and handles lists containing a mix of strings and dictionaries.
+    Only what the sidebar needs: path, numeric ID and display title (both stored at write time),
+    sorted by ID. Papers whose file name is not a number have no ID and are left out, as before.
     """
-    data = safe_json_loads(metrics_json_string)
-
-    if not data or not isinstance(data, list):
-        return ""  # Return empty if there's no data or it's not a list
-
-    # --- NEW ROBUST LOGIC ---
-    # Create a new list to hold the properly formatted string for each item.
-    formatted_parts = []
-
-    # Iterate through each item in the list individually.
-    for item in data:
-        if isinstance(item, str):
-            # If it's a string, add it directly.
-            formatted_parts.append(item)
-        elif isinstance(item, dict):
-            # If it's a dictionary, format it into "name: value".
-            if 'name' in item and 'value' in item:
-                formatted_parts.append(f"{item['name']}: {item['value']}")
-            else:
-                # Fallback for unexpected dictionary structures.
-                formatted_parts.append(str(item))
-        else:
-            # Fallback for any other unexpected data type.
-            formatted_parts.append(str(item))
-
-    # Join the final list of formatted strings. Using a semicolon is good for readability.
-    return "; ".join(formatted_parts)
-
-
-def format_simple_list(json_string: str) -> str:
+    return _read_query(db_path, f"SELECT paper_id AS ID, path, display_title FROM {database.TABLE_NAME} "
+                                f"WHERE paper_id IS NOT NULL ORDER BY paper_id")
+
+
+@st.cache_data
+def get_paper(db_path: str, path: str, version: tuple = None) -> dict:
+    """Fetches the full row of one paper by its primary key (empty dict if it is gone)."""
+    df = _read_query(db_path, f"SELECT * FROM {database.TABLE_NAME} WHERE path = ?", (path,))
+    return df.iloc[0].to_dict() if not df.empty else {}
+
+
+# Columns of the comparison table, in display order. List fields come from their preformatted
+# display columns (see database.DISPLAY_COLUMNS), under the original names.
+COMPARISON_COLUMNS = ['COALESCE(paper_id, path) AS ID', 'title', 'year', 'proposed_model_name',
+                      'methods_display AS experimental_methods', 'dataset_name', 'data_description', 'source_type',
+                      'dataset_duration', 'granularity_scale', 'resolution',
+                      'preprocessing_display AS data_preprocessing', 'features_display AS features_used',
+                      'train_test_split', 'horizon', 'metrics_display AS metrics', 'data_availability',
+                      'code_availability']
+
+# What the user may sort by -> SQL expression (a whitelist; never interpolate user input).
+COMPARISON_SORT = {"ID": "paper_id", "Year": "year", "Title": "title COLLATE NOCASE",
+                   "Proposed Model": "proposed_model_name COLLATE NOCASE", "Dataset Name": "dataset_name COLLATE NOCASE"}
+
+
+def _comparison_filters(year_range: tuple = None, dataset: str = "", model: str = "") -> tuple:
+    """WHERE clause and parameters for the comparison table's filters."""
+    conditions, params = [], []
+    if year_range is not None:
+        conditions.append("year BETWEEN ? AND ?")
+        params += list(year_range)
+    if dataset:
+        conditions.append("dataset_name LIKE ?")
+        params.append(f"%{dataset}%")
+    if model:
+        # Either the paper's own model or one of the methods it evaluates (child table, see database.py).
+        conditions.append("(proposed_model_name LIKE ? OR EXISTS (SELECT 1 FROM paper_method m "
+                          "WHERE m.fingerprint = s.fingerprint AND m.method LIKE ?))")
+        params += [f"%{model}%", f"%{model}%"]
+    return ("WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+
+@st.cache_data
+def get_year_range(db_path: str, version: tuple = None) -> tuple:
+    df = _read_query(db_path, f"SELECT MIN(year) AS low, MAX(year) AS high FROM {database.TABLE_NAME}")
+    if df.empty or pd.isna(df['low'].iloc[0]):
+        return None
+    return int(df['low'].iloc[0]), int(df['high'].iloc[0])
+
+
+@st.cache_data
+def count_comparison_rows(db_path: str, version: tuple = None, year_range: tuple = None, dataset: str = "",
+                          model: str = "") -> int:
+    """Number of papers matching the comparison table's filters."""
+    where, params = _comparison_filters(year_range, dataset, model)
+    count = _read_query(db_path, f"SELECT COUNT(*) AS n FROM {database.TABLE_NAME} s {where}", tuple(params))
+    return int(count['n'].iloc[0]) if not count.empty else 0
+
+
+@st.cache_data
+def get_comparison_page(db_path: str, version: tuple = None, year_range: tuple = None, dataset: str = "",
+                        model: str = "", sort_by: str = "ID", descending: bool = False,
+                        limit: int = 50, offset: int = 0) -> pd.DataFrame:
     """
-    Formats a JSON string representing a simple list of items
-    into a human-readable, comma-separated string.
+    One page of the comparison table: filtering, sorting and LIMIT/OFFSET all happen in SQLite,
+    and the rows come back ready to display.
     """
-    data = safe_json_loads(json_string)
+    where, params = _comparison_filters(year_range, dataset, model)
+    order = f"{COMPARISON_SORT.get(sort_by, 'paper_id')} {'DESC' if descending else 'ASC'}, path"
 
-    if not data or not isinstance(data, list):
-        return ""
+    return _read_query(db_path, f"SELECT {', '.join(COMPARISON_COLUMNS)} FROM {database.TABLE_NAME} s "
+                                f"{where} ORDER BY {order} LIMIT ? OFFSET ?", tuple(params + [limit, offset]))
 
-    # Ensure all items are strings before joining
-    return ", ".join(map(str, data))
\ No newline at end of file
+
+def search_papers(db_path: str, query: str, limit: int = 20, offset: int = 0) -> list:
+    """Ranked full-text search (see `database.search_papers`), run in SQLite over a read-only connection."""
+    if not os.path.exists(db_path) or not query.strip():
+        return []
+    try:
+        conn = database.connect_readonly(db_path)
+        try:
+            return database.search_papers(query, limit, offset, conn=conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        st.error(f"Search failed: {e}")
+        return []
@@ -0,0 +1,88 @@
+import json
+import sqlite3
+import threading
+import zlib
+import definitions
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; fall back to zlib so the cache still works without it
+    zstandard = None
+
+
+def _compress(value) -> tuple:
+    raw = json.dumps(value).encode("utf-8")
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(raw)
+    return "zlib", zlib.compress(raw, 6)
+
+
+def _decompress(codec: str, blob: bytes):
+    if codec == "zstd":
+        if zstandard is None:
+            return None  # Written by an install that had zstd; treat as a miss
+        raw = zstandard.ZstdDecompressor().decompress(blob)
+    else:
+        raw = zlib.decompress(blob)
+    return json.loads(raw.decode("utf-8"))
+
+
+class TextCache:
+    """
+    A compressed, persistent store of everything the ingestion nodes derive from a PDF:
+    per-page text, OCR output, landmark offsets and the PDF's own metadata.
+
+    Entries are keyed by (fingerprint, extractor version, kind), so a re-run over the same
+    file skips PyMuPDF and Tesseract entirely, and changing the extraction code only needs
+    a bump of `TEXT_EXTRACTOR_VERSION`.
+    """
+
+    def __init__(self, path, extractor_version: int):
+        self.path = path
+        self.extractor_version = extractor_version
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("""CREATE TABLE IF NOT EXISTS extracted_text (
+                                    fingerprint       TEXT,
+                                    extractor_version INTEGER,
+                                    kind              TEXT,
+                                    codec             TEXT,
+                                    blob              BLOB,
+                                    PRIMARY KEY (fingerprint, extractor_version, kind)
+                                  )""")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, fingerprint: str, kind: str):
+        """Returns the stored value for this paper and kind, or None if there is none."""
+        if not fingerprint:
+            return None
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT codec, blob FROM extracted_text WHERE fingerprint = ? AND extractor_version = ? AND kind = ?",
+                (fingerprint, self.extractor_version, kind)).fetchone()
+        if row is None:
+            return None
+        try:
+            return _decompress(row[0], row[1])
+        except Exception as e:
+            print(f"--- WARNING: Ignoring unreadable text cache entry ({kind}): {e} ---")
+            return None
+
+    def put(self, fingerprint: str, kind: str, value):
+        if not fingerprint:
+            return
+        codec, blob = _compress(value)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO extracted_text VALUES (?, ?, ?, ?, ?)",
+                         (fingerprint, self.extractor_version, kind, codec, blob))
+            conn.commit()
+
+
+# --- One store shared by every ingestion node ---
+text_cache = TextCache(definitions.TEXT_CACHE_PATH, definitions.TEXT_EXTRACTOR_VERSION)
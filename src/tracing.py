@@ -0,0 +1,144 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+import definitions
+
+# Node-level tracing. When `definitions.TRACING` is on, every graph node (and the runner's
+# prefetch and database-write stages) records a span with start/end time, thread, paper and
+# state size. `save()` writes them as a Chrome trace (open in chrome://tracing or
+# https://ui.perfetto.dev) or as JSONL, one file per run.
+
+_events = []
+_lock = threading.Lock()
+_origin = time.perf_counter()
+_pid = os.getpid()
+
+
+def enabled() -> bool:
+    return definitions.TRACING
+
+
+def _track() -> tuple:
+    """
+    Returns (track id, track name) for the current execution context. Coroutines on the event
+    loop all share one OS thread, so each asyncio task gets its own track; otherwise their
+    overlapping spans would be drawn on top of each other.
+    """
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return id(task) % 1_000_000_000, f"task {task.get_name()}"
+    thread = threading.current_thread()
+    return thread.ident % 1_000_000_000, thread.name
+
+
+def _paper_id(state) -> str:
+    if not isinstance(state, dict):
+        return ""
+    if state.get('path'):
+        return os.path.basename(state['path'])
+    return (state.get('fingerprint') or "")[:12]
+
+
+def _state_size(state) -> int:
+    """Approximate size of the state in characters (text fields) and items (lists/dicts)."""
+    if not isinstance(state, dict):
+        return 0
+    return sum(len(value) if isinstance(value, (str, list, dict)) else 1
+               for value in state.values() if value is not None)
+
+
+def _record(name: str, category: str, start: float, end: float, track: tuple, args: dict):
+    event = {"name": name, "cat": category, "ph": "X",
+             "ts": (start - _origin) * 1e6, "dur": (end - start) * 1e6,
+             "pid": _pid, "tid": track[0],
+             "args": dict(args, track=track[1])}
+    with _lock:
+        _events.append(event)
+
+
+@contextmanager
+def span(name: str, paper: str = "", category: str = "stage", **args):
+    """Traces an arbitrary block, e.g. a database write. Does nothing when tracing is off."""
+    if not enabled():
+        yield
+        return
+    track = _track()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _record(name, category, start, time.perf_counter(), track, dict(args, paper=paper))
+
+
+def traced(name: str, fn):
+    """
+    Wraps a graph node so each execution is recorded as a span. Sync nodes stay sync and async
+    nodes stay async, so LangGraph still runs them the same way. Returned unchanged when tracing
+    is off at graph build time.
+    """
+    if not enabled():
+        return fn
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            track = _track()
+            start = time.perf_counter()
+            try:
+                return await fn(state, *args, **kwargs)
+            finally:
+                _record(name, "node", start, time.perf_counter(), track,
+                        {"paper": _paper_id(state), "state_size": _state_size(state)})
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def wrapper(state, *args, **kwargs):
+        track = _track()
+        start = time.perf_counter()
+        try:
+            return fn(state, *args, **kwargs)
+        finally:
+            _record(name, "node", start, time.perf_counter(), track,
+                    {"paper": _paper_id(state), "state_size": _state_size(state)})
+    return wrapper
+
+
+def events() -> list:
+    """A copy of the spans recorded so far."""
+    with _lock:
+        return list(_events)
+
+
+def reset():
+    with _lock:
+        _events.clear()
+
+
+def save(run_id: str) -> str:
+    """Writes the collected spans to TRACE_DIR and returns the file path (None if nothing was traced)."""
+    spans = events()
+    if not spans:
+        return None
+
+    os.makedirs(definitions.TRACE_DIR, exist_ok=True)
+    if definitions.TRACE_FORMAT == "jsonl":
+        path = os.path.join(definitions.TRACE_DIR, f"trace-{run_id}.jsonl")
+        with open(path, "w") as f:
+            for event in spans:
+                f.write(json.dumps(event) + "\n")
+    else:
+        path = os.path.join(definitions.TRACE_DIR, f"trace-{run_id}.json")
+        with open(path, "w") as f:
+            json.dump({"traceEvents": spans, "displayTimeUnit": "ms"}, f)
+
+    print(f"--- Trace with {len(spans)} spans written to {path} ---")
+    return path
+
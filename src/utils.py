@@ -1,4 +1,6 @@
 import fitz
+import functools
+import hashlib
 import re
 import tiktoken
 import pprint
@@ -10,6 +12,14 @@ import definitions
 pytesseract.pytesseract.tesseract_cmd = definitions.TESSERACT_CMD_PATH
 
 
+@functools.lru_cache(maxsize=1)
+def _get_encoding():
+    # The 'cl100k_base' encoding is used by GPT-4 and is a good general-purpose
+    # tokenizer that gives a very close approximation for Llama 3 models.
+    # Loading it is expensive, so it is done once per process.
+    return tiktoken.get_encoding("cl100k_base")
+
+
 def count_tokens(text: str) -> int:
     """
     Counts the number of tokens in a string using a tokenizer
@@ -18,10 +28,8 @@ def count_tokens(text: str) -> int:
     if not isinstance(text, str):
         return 0
 
-    # The 'cl100k_base' encoding is used by GPT-4 and is a good general-purpose
-    # tokenizer that gives a very close approximation for Llama 3 models.
     try:
-        encoding = tiktoken.get_encoding("cl100k_base")
+        encoding = _get_encoding()
         num_tokens = len(encoding.encode(text))
         return num_tokens
     except Exception:
@@ -29,6 +37,18 @@ def count_tokens(text: str) -> int:
         return len(text.split()) * 4 // 3
 
 
+def file_fingerprint(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Computes the SHA-256 of a file's bytes, streamed in chunks so large PDFs are never
+    loaded into memory at once. This is the paper's identity, independent of its name.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 def pretty_print_dict_of_dict(dictionary):
     for key, value in dictionary.items():
         print(f"{key}")
@@ -47,87 +67,99 @@ def pretty_print_dict(dictionary):
         print("\n")
 
 
-def extract_text_from_all_pages(paper):
+@functools.lru_cache(maxsize=8)
+def _stop_heading_pattern(stop_headings: tuple):
+    # A stop heading must stand on its own line (optionally numbered, e.g. "7. References"),
+    # so a sentence that merely mentions "references" does not cut the paper short.
+    alternatives = "|".join(re.escape(heading).replace(r"\ ", r"\s+") for heading in stop_headings)
+    return re.compile(rf"^[ \t]*(?:(?:\d{{1,2}}|[IVX]{{1,4}})\.?[ \t]+)?(?:{alternatives})[ \t]*:?[ \t]*$",
+                      re.IGNORECASE | re.MULTILINE)
+
+
+def find_stop_heading(text: str, stop_headings=None) -> int:
+    """Returns the offset of the first stop heading in `text`, or -1 if there is none."""
+    headings = tuple(stop_headings if stop_headings is not None else definitions.TEXT_STOP_HEADINGS)
+    if not headings:
+        return -1
+    match = _stop_heading_pattern(headings).search(text)
+    return match.start() if match else -1
+
+
+def pages_until_stop(page_texts, stop_headings=None):
     """
-    Extracts text from all pages of a PDF file.
+    Lazily yields page texts up to the first stop heading (References by default, see
+    `TEXT_STOP_HEADINGS`); the page that carries it is cut just before the heading.
+    `page_texts` can be a generator, in which case the pages after it are never requested.
+    """
+    for text in page_texts:
+        stop = find_stop_heading(text, stop_headings)
+        if stop != -1:
+            yield text[:stop]
+            return
+        yield text
 
-    Args:
-        pdf_path (str): The file path to the PDF.
+
+def join_page_texts(page_texts) -> str:
+    """
+    Joins page texts, already cut by `pages_until_stop`, with page separators.
 
     Returns:
-        str: The concatenated text from all pages.
+        str: The concatenated text.
     """
-    all_text = ""
-    try:
-        # Iterate through each page of the document
-        for page in paper:
-            # Extract text from the current page
-            text = page.get_text()
-            all_text += text
-            # Optional: Add a page separator for clarity
+    return "\n--- Page Break ---\n".join(page_texts)
+
 
-            all_text += "\n--- Page Break ---\n"
+def render_page_image(page: pymupdf.Page, dpi: int = 300) -> Image.Image:
+    """
+    Renders a page to a Pillow image for Tesseract. This is the only part of OCR that needs
+    MuPDF, so callers sharing a document can hold the MuPDF lock for just this step.
 
-        pattern = re.compile(r'\bReferences\b')
-        all_text = re.split(pattern, all_text)[0]
+    Args:
+        page: A pymupdf Page object.
+        dpi: The resolution the page is rendered at before OCR.
+    """
+    # Grayscale without alpha is all Tesseract needs, and a third of the bytes of RGB.
+    pix = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY, alpha=False)
 
-        # pattern = re.compile(r'\bCRediT authorship contribution statement\b')
-        # all_text = re.split(pattern, all_text)[0]
-        #
-        # pattern = re.compile(r'\bAppendix\b')
-        # all_text = re.split(pattern, all_text)[0]
-        #
-        # pattern = re.compile(r'\bAuthor contributions\b')
-        # all_text = re.split(pattern, all_text)[0]
+    # Determine the image mode (e.g., RGB, Grayscale) from the pixmap
+    if pix.n >= 4:  # RGBA or similar
+        mode = "RGBA"
+    elif pix.n == 3:  # RGB
+        mode = "RGB"
+    elif pix.n == 1:  # Grayscale
+        mode = "L"
+    else:
+        raise ValueError(f"Unsupported number of components in pixmap: {pix.n}")
 
-        # pattern = re.compile(r'\bAcknowledgements\b')
-        # all_text = re.split(pattern, all_text)[0]
+    # Create a Pillow Image object from the raw pixmap samples (a copy, independent of MuPDF)
+    return Image.frombytes(mode, [pix.width, pix.height], pix.samples)
 
-        # pattern = re.compile(r'CRediT authorship contribution statement', re.IGNORECASE)
-        # all_text = re.split(pattern, all_text)[0]
 
-        return all_text
+def ocr_image(image: Image.Image) -> str:
+    """
+    Performs OCR on a rendered page image. Going through a Pillow Image object is the most
+    reliable way to interface with Tesseract.
 
+    Returns:
+        The extracted text as a string ("" on failure).
+    """
+    try:
+        return pytesseract.image_to_string(image)
     except Exception as e:
-        return f"An error occurred: {e}"
+        print(f"--- OCR Error: {e} ---")
+        return ""
 
 
-def ocr_page_text(page: pymupdf.Page) -> str:
+def ocr_page_text(page: pymupdf.Page, dpi: int = 300) -> str:
     """
-    Performs OCR on a given page to extract text.
-    This robust version converts the page to a Pillow Image object
-    to ensure compatibility with Tesseract.
-
-    Args:
-        page: A pymupdf Page object.
+    Performs OCR on a given page to extract text: renders it, then runs Tesseract on the image.
 
     Returns:
-        The extracted text as a string.
+        The extracted text as a string ("" on failure).
     """
     try:
-        # 1. Render the page to a high-resolution image (pixmap)
-        pix = page.get_pixmap(dpi=300)
-
-        # --- NEW ROBUST LOGIC ---
-        # 2. Determine the image mode (e.g., RGB, Grayscale) from the pixmap
-        if pix.n >= 4:  # RGBA or similar
-            mode = "RGBA"
-        elif pix.n == 3:  # RGB
-            mode = "RGB"
-        elif pix.n == 1:  # Grayscale
-            mode = "L"
-        else:
-            raise ValueError(f"Unsupported number of components in pixmap: {pix.n}")
-
-        # 3. Create a Pillow Image object from the raw pixmap samples
-        img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
-
-        # 4. Use pytesseract to perform OCR on the Pillow Image object
-        # This is the most reliable way to interface with Tesseract.
-        text = pytesseract.image_to_string(img)
-        # --- END OF NEW LOGIC ---
-
-        return text
+        image = render_page_image(page, dpi)
     except Exception as e:
         print(f"--- OCR Error: {e} ---")
-        return ""
\ No newline at end of file
+        return ""
+    return ocr_image(image)
\ No newline at end of file
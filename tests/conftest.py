@@ -0,0 +1,19 @@
+import pytest
+from src import database, initialise_state
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh survey database in a temporary directory, on the shared connection."""
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "survey.db")
+    database.create_database()
+    yield database
+    database.close_connection()
+
+
+def make_state(path: str, fingerprint: str, **fields) -> dict:
+    """A finished graph state for one paper."""
+    state = initialise_state.initialise_state()
+    state.update(path=path, fingerprint=fingerprint, title=f"Paper {fingerprint}", year=2020, relevancy=True)
+    state.update(fields)
+    return state
@@ -0,0 +1,102 @@
+import sqlite3
+from src import database, runner, checkpoint
+from tests.conftest import make_state
+
+
+def _survey(db):
+    with db.connection() as conn:
+        return {row[0]: row[1:] for row in
+                conn.execute(f"SELECT fingerprint, path, paper_id, display_title FROM {db.TABLE_NAME}")}
+
+
+def _manifest(db):
+    with db.connection() as conn:
+        return dict(conn.execute(f"SELECT fingerprint, path FROM {db.MANIFEST_TABLE}").fetchall())
+
+
+def _save(db, *papers):
+    assert db.save_results([(path, make_state(path, fingerprint), True) for path, fingerprint in papers])
+
+
+def test_sync_manifest_follows_a_renamed_file(db):
+    _save(db, ("papers/paper.pdf", "a"))
+    db.sync_manifest({"papers/3.pdf": "a"})
+
+    assert _survey(db) == {"a": ("papers/3.pdf", 3, "3 : Paper a")}
+    assert _manifest(db) == {"a": "papers/3.pdf"}
+    assert db.processed_fingerprints() == {"a"}
+
+
+def test_sync_manifest_swaps_file_names_between_papers(db):
+    _save(db, ("papers/0.pdf", "a"), ("papers/1.pdf", "b"))
+    db.sync_manifest({"papers/0.pdf": "b", "papers/1.pdf": "a"})
+
+    assert _survey(db) == {"a": ("papers/1.pdf", 1, "1 : Paper a"), "b": ("papers/0.pdf", 0, "0 : Paper b")}
+
+
+def test_sync_manifest_parks_a_removed_paper_whose_name_is_reused(db):
+    _save(db, ("papers/0.pdf", "a"), ("papers/1.pdf", "b"))
+    db.sync_manifest({"papers/0.pdf": "a", "papers/1.pdf": "b"})
+    # papers/0.pdf now holds a new PDF; paper "a" has left the folder.
+    db.sync_manifest({"papers/0.pdf": "c", "papers/1.pdf": "b"})
+
+    survey = _survey(db)
+    assert survey["a"] == (f"{db.PARKED_PREFIX}a", None, "Paper a")
+    assert survey["b"] == ("papers/1.pdf", 1, "1 : Paper b")
+    assert _manifest(db) == {"a": None, "b": "papers/1.pdf", "c": "papers/0.pdf"}
+
+
+def test_sync_manifest_backfills_fingerprints_and_indexes_them_for_search(db):
+    with db.transaction() as conn:
+        conn.execute(f"INSERT INTO {db.TABLE_NAME} (path, title) VALUES ('papers/7.pdf', 'Legacy LSTM paper')")
+    assert db.search_papers("lstm") == []
+
+    db.sync_manifest({"papers/7.pdf": "z"})
+    assert [result["path"] for result in db.search_papers("lstm")] == ["papers/7.pdf"]
+
+
+def test_search_survives_vacuum_and_rewrites(db):
+    _save(db, ("papers/0.pdf", "a"), ("papers/1.pdf", "b"))
+    _save(db, ("papers/0.pdf", "a"))
+    with db.connection() as conn:
+        conn.execute("VACUUM")
+
+    results = db.search_papers("paper")
+    assert sorted(result["display_title"] for result in results) == ["0 : Paper a", "1 : Paper b"]
+
+
+def test_save_results_reports_a_failed_write_and_writes_nothing(db, monkeypatch):
+    def fail(cursor, data):
+        raise sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(database, "_upsert", fail)
+
+    assert db.save_results([("papers/0.pdf", make_state("papers/0.pdf", "a"), True)]) is False
+    assert _survey(db) == {}
+    assert _manifest(db) == {}
+    assert db.processed_fingerprints() == set()
+
+
+def test_runner_keeps_checkpoints_when_the_write_fails(db, monkeypatch):
+    pruned = []
+    monkeypatch.setattr(checkpoint, "prune", pruned.extend)
+    monkeypatch.setattr(database, "save_results", lambda results: False)
+
+    assert runner._save_results([("papers/0.pdf", make_state("papers/0.pdf", "a"))]) == 0
+    assert pruned == []
+
+
+def test_runner_prunes_checkpoints_once_the_write_commits(db, monkeypatch):
+    pruned = []
+    monkeypatch.setattr(checkpoint, "prune", pruned.extend)
+
+    assert runner._save_results([("papers/0.pdf", make_state("papers/0.pdf", "a"))]) == 1
+    assert pruned == ["a"]
+    assert db.processed_fingerprints() == {"a"}
+
+
+def test_reinitialize_database_clears_relevancy_labels(db):
+    _save(db, ("papers/0.pdf", "a"))
+    db.reinitialize_database()
+
+    assert _survey(db) == {}
+    assert db.fetch_relevancy_labels(("pro",)) == []
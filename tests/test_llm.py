@@ -0,0 +1,110 @@
+import threading
+import pytest
+import definitions
+from src import llm
+
+
+class Throttled(Exception):
+    code = 429
+
+
+class Response:
+    def __init__(self, tokens: int = 10):
+        self.usage_metadata = {"total_tokens": tokens}
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(definitions, "LLM_BACKOFF_BASE_S", 0.0)
+    monkeypatch.setattr(definitions, "LLM_AIMD_COOLDOWN_S", 0.0)
+    monkeypatch.setattr(definitions, "LLM_MAX_RETRIES", 3)
+    monkeypatch.setattr(definitions, "MAX_IN_FLIGHT_LLM_REQUESTS", 8)
+    monkeypatch.setattr(definitions, "LLM_MIN_IN_FLIGHT", 1)
+
+
+def _governor(limit: int = 8) -> llm.Governor:
+    governor = llm.Governor(llm.RequestLimiter(limit))
+    governor.requests = None
+    governor.tokens = llm.TokenBucket(100_000)
+    return governor
+
+
+def test_raising_the_limit_hands_slots_to_waiters():
+    limiter = llm.RequestLimiter(1)
+    limiter.acquire()
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.05)
+
+    limiter.set_limit(2)
+    assert acquired.wait(1)
+    assert limiter.in_flight == 2
+    waiter.join()
+
+
+def test_lowering_the_limit_takes_effect_as_requests_finish():
+    limiter = llm.RequestLimiter(2)
+    limiter.acquire()
+    limiter.acquire()
+    limiter.set_limit(1)
+    limiter.release()
+    assert limiter.in_flight == 1
+
+    acquired = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), acquired.set()))
+    waiter.start()
+    assert not acquired.wait(0.05)
+    limiter.release()
+    assert acquired.wait(1)
+    waiter.join()
+
+
+def test_throttling_halves_the_limit_and_successes_restore_it(fast_retries):
+    governor = _governor()
+    answers = iter([Throttled("429 Too Many Requests")])
+
+    def call(prompt):
+        error = next(answers, None)
+        if error is not None:
+            raise error
+        return Response()
+
+    response, _, retries = governor.call(call, "prompt")
+    assert retries == 1
+    assert governor.limiter.limit == 4
+
+    # One more slot after each window of `limit` successes, up to MAX_IN_FLIGHT_LLM_REQUESTS.
+    for _ in range(4 + 5 + 6 + 7 + 8):
+        governor.call(call, "prompt")
+    assert governor.limiter.limit == 8
+    assert governor.stats["min_limit"] == 4
+
+
+def test_failed_attempts_give_their_token_reservation_back(fast_retries):
+    governor = _governor()
+    answers = iter([Throttled("429"), Throttled("429"), Throttled("429")])
+
+    def call(prompt):
+        error = next(answers, None)
+        if error is not None:
+            raise error
+        return Response(tokens=10)
+
+    governor.call(call, "prompt")
+    # Only the successful attempt's real usage is charged (allowing for refill during the test).
+    assert governor.tokens._level >= governor.tokens.capacity - 10
+
+
+def test_non_transient_errors_are_not_retried(fast_retries):
+    governor = _governor()
+    calls = []
+
+    def call(prompt):
+        calls.append(prompt)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        governor.call(call, "prompt")
+    assert len(calls) == 1
+    assert governor.limiter.limit == 8
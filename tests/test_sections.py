@@ -0,0 +1,76 @@
+from src import sections
+
+TEXT = """Forecasting urban water demand
+Abstract
+We forecast demand.
+Keywords: water, LSTM
+1. Introduction
+Demand matters.
+--- Page Break ---
+2. Methods
+2.1 Data preprocessing
+Outliers were removed.
+2.2 Model
+An LSTM.
+3. Data
+Ten years of hourly readings.
+4. Results and discussion
+It works.
+References
+[1] A paper.
+"""
+
+
+def _names(index):
+    return [(entry["name"], entry["level"]) for entry in index]
+
+
+def test_build_index_classifies_headings_with_levels_and_pages():
+    index = sections.build_section_index(TEXT)
+    assert _names(index) == [("abstract", 1), ("keywords", 1), ("introduction", 1), ("methodology", 1),
+                             ("data", 2), ("other", 2), ("data", 1), ("results", 1), ("references", 1)]
+    pages = {entry["title"]: entry["page"] for entry in index}
+    assert pages["1. Introduction"] == 0
+    assert pages["2. Methods"] == 1
+
+
+def test_longer_heading_names_are_preferred():
+    index = sections.build_section_index("Intro text\nData description\nThe data.\nData\nMore.\n")
+    assert [entry["title"] for entry in index if entry["name"] == "data"] == ["Data description", "Data"]
+
+
+def test_unnumbered_heading_with_trailing_text_is_rejected():
+    index = sections.build_section_index("Results show that the model works well\n")
+    assert index == []
+
+
+def test_section_span_prefers_the_shallowest_heading():
+    index = sections.build_section_index(TEXT)
+    start, end = sections.section_span(index, "data", len(TEXT))
+    assert TEXT[start:end] == "3. Data\nTen years of hourly readings.\n"
+
+
+def test_section_span_runs_to_the_next_heading_at_the_same_or_a_higher_level():
+    index = sections.build_section_index(TEXT)
+    text = sections.section_text(TEXT, index, "methodology")
+    assert text.startswith("2. Methods")
+    assert "2.2 Model" in text
+    assert "3. Data" not in text
+
+
+def test_section_span_of_a_missing_section():
+    index = sections.build_section_index(TEXT)
+    assert sections.section_span(index, "conclusion", len(TEXT)) == (-1, -1)
+    assert sections.section_text(TEXT, index, "conclusion") == ""
+
+
+def test_landmarks_use_the_last_references_heading():
+    text = "Abstract\nSee the references below.\nReferences\nx\nAppendix\nReferences\ny\n"
+    landmarks = sections.locate_landmarks(text)
+    assert landmarks["references_start"] == text.rindex("References")
+    assert landmarks["abstract_start"] == 0
+
+
+def test_slice_abstract_stops_at_keywords():
+    landmarks = sections.locate_landmarks(TEXT)
+    assert sections.slice_abstract(TEXT, landmarks) == "We forecast demand."